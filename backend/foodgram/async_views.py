@@ -0,0 +1,271 @@
+"""
+Асинхронные обработчики горячих GET-запросов для ASGI-развёртывания
+(ASYNC_READ_VIEWS=true): список и карточка рецепта, поиск ингредиентов,
+профиль пользователя.
+
+Данные читаются через async ORM, ответы совпадают с ответами вьюсетов
+DRF: те же сериализаторы, пагинация, ETag и кэш ответов анонимам. Всё
+остальное — другие методы, Browsable API, параметры, которые здесь не
+разбираются, неизвестный токен, 404 — передаётся обычным вьюсетам.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from foodgram.replicas import achoose_replica, primary_reads, read_from
+from recipes.conditional import (
+    RESPONSE_CACHE_TIMEOUT,
+    add_validators,
+    make_validators,
+    reads_for,
+    response_cache_key,
+    version_names
+)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Recipe
+from recipes.pagination import RecipePagination
+from recipes.serializers import (
+    IngredientSerializer,
+    RecipeListSerializer,
+    RecipeReadSerializer
+)
+from recipes.versions import aget_versions
+from recipes.viewer import aprepare_viewer_context
+from recipes.views import IngredientViewSet, RecipeViewSet
+from users.authentication import token_cache
+from users.pagination import cached_count
+from users.serializers import CustomUserSerializer
+from users.views import UserViewSet
+
+User = get_user_model()
+
+JSON_MEDIA_TYPE = 'application/json'
+JSON_ACCEPT = {'', '*/*', 'application/*', JSON_MEDIA_TYPE}
+
+recipe_list_view = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+recipe_detail_view = RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+ingredient_list_view = IngredientViewSet.as_view({'get': 'list'})
+user_detail_view = UserViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+
+
+def _scoped_reads(view):
+    """
+    Выбор реплики не переживает запрос: под WSGI async_to_sync
+    возвращает изменения контекста в поток сервера.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        with primary_reads():
+            return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _authenticate(request):
+    """Пользователь по токену; None — пусть проверяет DRF."""
+    header = request.headers.get('Authorization')
+    if not header:
+        return AnonymousUser()
+    keyword, _, key = header.partition(' ')
+    if keyword.lower() != 'token' or not key or ' ' in key:
+        return None
+    token = await token_cache.aget(key)
+    if token is not None:
+        return token.user
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    await token_cache.aset(token)
+    return token.user
+
+
+async def _prepare(request, params=()):
+    """
+    DRF-запрос с пользователем или None, если запрос должен обработать
+    обычный вьюсет.
+    """
+    accept = {
+        media_type.split(';')[0].strip()
+        for media_type in request.headers.get('Accept', '').split(',')
+    }
+    if (request.method != 'GET' or not accept <= JSON_ACCEPT
+            or set(request.GET) - set(params)):
+        return None
+    # Как и rest_framework.request.Request: APIClient.force_authenticate().
+    user = getattr(request, '_force_auth_user', None)
+    if user is None:
+        user = await _authenticate(request)
+    if user is None:
+        return None
+    # Как ReplicaReadMixin: после аутентификации.
+    read_from(await achoose_replica(user))
+    drf_request = Request(request)
+    drf_request.user = user
+    return drf_request
+
+
+@sync_to_async
+def _serialize(serializer_class, instance, request, **kwargs):
+    """
+    В потоке, не в цикле событий: сериализаторы DRF синхронные, и
+    на больших страницах их работа заметно держала бы цикл.
+    """
+    return serializer_class(
+        instance, context={'request': request}, **kwargs
+    ).data
+
+
+def _json_response(data):
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type=JSON_MEDIA_TYPE
+    )
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+async def _conditional(request, build_data):
+    """
+    То же, что recipes.conditional.conditional_response. None — данных
+    нет (например, 404), ответ нужно отдать через вьюсет.
+    """
+    user = request.user
+    versions = await aget_versions(version_names(user))
+    etag, last_modified = make_validators(
+        versions, request.build_absolute_uri(), JSON_MEDIA_TYPE
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        key = response_cache_key(etag)
+        data = None if user.is_authenticated else await cache.aget(key)
+        if data is None:
+            with reads_for(last_modified):
+                data = await build_data()
+            if data is None:
+                return None
+            if not user.is_authenticated:
+                await cache.aset(key, data, RESPONSE_CACHE_TIMEOUT)
+        response = _json_response(data)
+    return add_validators(response, user, etag, last_modified)
+
+
+@_scoped_reads
+async def recipe_list(request):
+    drf_request = await _prepare(
+        request, ('limit', 'offset', 'page', 'author')
+    )
+    author = request.GET.get('author')
+    if drf_request is None or (author is not None and not author.isdigit()):
+        return await sync_to_async(recipe_list_view)(request)
+
+    async def build_data():
+        user = drf_request.user
+        queryset = Recipe.objects.with_read_data()
+        if author is not None:
+            if not await User.objects.filter(pk=author).aexists():
+                return None
+            queryset = queryset.filter(author_id=author)
+        paginator = RecipePagination()
+        paginator.request = drf_request
+        paginator.limit = paginator.get_limit(drf_request)
+        paginator.offset = paginator.get_offset(drf_request)
+        paginator.count, paginator.count_approximate = await sync_to_async(
+            cached_count
+        )(queryset, user)
+        page = []
+        if 0 < paginator.count and paginator.offset <= paginator.count:
+            page = [
+                recipe async for recipe in queryset[
+                    paginator.offset:paginator.offset + paginator.limit
+                ]
+            ]
+        await aprepare_viewer_context(drf_request)
+        data = await _serialize(
+            RecipeListSerializer, page, drf_request, many=True
+        )
+        return paginator.get_paginated_response(data).data
+
+    response = await _conditional(drf_request, build_data)
+    if response is None:
+        return await sync_to_async(recipe_list_view)(request)
+    return response
+
+
+@_scoped_reads
+async def recipe_detail(request, pk):
+    drf_request = await _prepare(request)
+    if drf_request is None:
+        return await sync_to_async(recipe_detail_view)(request, pk=pk)
+
+    async def build_data():
+        try:
+            recipe = await Recipe.objects.with_read_data().aget(pk=pk)
+        except Recipe.DoesNotExist:
+            return None
+        await aprepare_viewer_context(drf_request)
+        return await _serialize(RecipeReadSerializer, recipe, drf_request)
+
+    response = await _conditional(drf_request, build_data)
+    if response is None:
+        return await sync_to_async(recipe_detail_view)(request, pk=pk)
+    return response
+
+
+@_scoped_reads
+async def ingredient_list(request):
+    drf_request = await _prepare(request, ('name',))
+    if drf_request is None:
+        return await sync_to_async(ingredient_list_view)(request)
+    name = request.GET.get('name')
+    if name:
+        ingredients = await sync_to_async(ingredient_index.search)(name)
+    else:
+        ingredients = await sync_to_async(ingredient_index.all)()
+    return _json_response(await _serialize(
+        IngredientSerializer, ingredients, drf_request, many=True
+    ))
+
+
+@_scoped_reads
+async def user_detail(request, pk):
+    drf_request = await _prepare(request)
+    if drf_request is None:
+        return await sync_to_async(user_detail_view)(request, pk=pk)
+    try:
+        user = await User.objects.select_related('profile').aget(pk=pk)
+    except User.DoesNotExist:
+        return await sync_to_async(user_detail_view)(request, pk=pk)
+    await aprepare_viewer_context(drf_request)
+    return _json_response(
+        await _serialize(CustomUserSerializer, user, drf_request)
+    )
+
+
+urlpatterns = [
+    path('api/recipes/', recipe_list),
+    path('api/recipes/<int:pk>/', recipe_detail),
+    path('api/ingredients/', ingredient_list),
+    path('api/users/<int:pk>/', user_detail),
+]
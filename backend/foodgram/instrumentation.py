@@ -0,0 +1,239 @@
+"""
+Замеры времени запросов: число SQL-запросов, время в БД, сериализации
+и рендеринга для каждого действия вьюсета. Результат отдаётся в заголовке
+Server-Timing и копится в скользящей сводке внутри процесса.
+
+Работает без DEBUG=True: запросы считаются через
+connection.execute_wrapper(), а не через connection.queries.
+"""
+import random
+import threading
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async
+)
+from django.conf import settings
+from django.db import connections
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+_current_timing = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.action = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.total = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += perf_counter() - started
+            self.queries += 1
+
+    def header(self):
+        return ', '.join((
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+
+class TimingSummary:
+    """
+    Скользящая сводка: последние `window` замеров по каждому действию.
+    """
+
+    def __init__(self, window):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def add(self, timing):
+        sample = (
+            timing.queries, timing.db, timing.serialize,
+            timing.render, timing.total
+        )
+        with self._lock:
+            self._samples[timing.action or 'unresolved'].append(sample)
+
+    def snapshot(self):
+        with self._lock:
+            samples = {
+                action: list(values)
+                for action, values in self._samples.items()
+            }
+        return {
+            action: self._describe(values)
+            for action, values in sorted(samples.items())
+        }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    @staticmethod
+    def _describe(values):
+        count = len(values)
+        queries, db, serialize, render, total = zip(*values)
+        totals = sorted(total)
+        return {
+            'count': count,
+            'queries_avg': round(sum(queries) / count, 1),
+            'queries_max': max(queries),
+            'db_ms_avg': round(sum(db) / count * 1000, 1),
+            'serialize_ms_avg': round(sum(serialize) / count * 1000, 1),
+            'render_ms_avg': round(sum(render) / count * 1000, 1),
+            'total_ms_avg': round(sum(total) / count * 1000, 1),
+            'total_ms_p95': round(
+                totals[min(count - 1, int(count * 0.95))] * 1000, 1
+            ),
+        }
+
+
+summary = TimingSummary(settings.SERVER_TIMING_WINDOW)
+
+
+def view_action_name(request, view_func):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'view')
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class ServerTimingMiddleware:
+    """
+    Выборочно (SERVER_TIMING_SAMPLE_RATE) замеряет запросы. Заголовок
+    Server-Timing получают только staff-пользователи, если не включён
+    SERVER_TIMING_PUBLIC: число запросов и время в БД — не для всех.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+        self.public = settings.SERVER_TIMING_PUBLIC
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _wrap_connections(stack, timing):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timing))
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                self._wrap_connections(stack, timing)
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self._finish(request, response, timing, started)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        started = perf_counter()
+        stack = ExitStack()
+        try:
+            # Соединения с БД у async ORM живут в потоке запроса
+            # (sync_to_async), обёртку ставим там же.
+            await sync_to_async(self._wrap_connections)(stack, timing)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current_timing.reset(token)
+        return self._finish(request, response, timing, started)
+
+    def _finish(self, request, response, timing, started):
+        timing.total = perf_counter() - started
+        # request.user к этому моменту выставлен и при входе по токену:
+        # DRF копирует пользователя в исходный запрос.
+        user = getattr(request, 'user', None)
+        if self.public or getattr(user, 'is_staff', False):
+            response['Server-Timing'] = timing.header()
+        summary.add(timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.action = view_action_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        timing = _current_timing.get()
+        if timing is not None:
+            started = perf_counter()
+
+            def record_render(rendered):
+                timing.render = perf_counter() - started
+
+            response.add_post_render_callback(record_render)
+        return response
+
+
+class TimedSerializerMixin:
+    """
+    Учитывает время to_representation() во времени сериализации запроса.
+    Вложенные сериализаторы не считаются повторно.
+    """
+
+    def to_representation(self, instance):
+        timing = _current_timing.get()
+        if timing is None or timing.serializing:
+            return super().to_representation(instance)
+        timing.serializing = True
+        started = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timing.serialize += perf_counter() - started
+            timing.serializing = False
+
+
+class ServerTimingSummaryView(APIView):
+    """
+    GET /api/server-timing/ — сводка замеров текущего процесса.
+    DELETE — сбросить сводку.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(summary.snapshot())
+
+    def delete(self, request):
+        summary.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,114 @@
+"""
+Чтение с реплик базы данных.
+
+Реплики — алиасы из settings.DATABASE_REPLICAS. С реплики читают только
+GET-запросы вьюсетов с ReplicaReadMixin, причём уже после
+аутентификации; запись, миграции, админка, команды и остальные
+запросы работают с default. Пользователь, который только что что-то
+изменил, REPLICA_PIN_SECONDS читает с основной базы, пока реплики
+догоняют.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY_PREFIX = 'db:primary:'
+
+_read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Явно: иначе объект, прочитанный с реплики, сохранился бы туда же.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def _pin_key(user):
+    return f'{PIN_KEY_PREFIX}{user.pk}'
+
+
+def pin_to_primary(user):
+    """После записи пользователь какое-то время читает с default."""
+    if user.is_authenticated and settings.DATABASE_REPLICAS:
+        cache.set(_pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+
+
+def choose_replica(user):
+    """Алиас реплики для чтения или None — читать с default."""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if user.is_authenticated and cache.get(_pin_key(user)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+async def achoose_replica(user):
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if user.is_authenticated and await cache.aget(_pin_key(user)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def read_from(alias):
+    """Направляет чтение текущего запроса на alias (None — default)."""
+    return _read_database.set(alias)
+
+
+@contextmanager
+def primary_reads():
+    """Читать с default внутри блока, даже если запрос шёл на реплику."""
+    token = _read_database.set(None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class ReplicaReadMixin:
+    """
+    GET-запросы вьюсета читают с реплики, остальные закрепляют
+    пользователя за основной базой.
+    """
+
+    _read_token = None
+
+    def dispatch(self, request, *args, **kwargs):
+        # Не в finalize_response: при исключении, которое DRF не
+        # превращает в ответ, она не вызывается, и выбор реплики
+        # достался бы следующему запросу этого потока.
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._read_token is not None:
+                _read_database.reset(self._read_token)
+                self._read_token = None
+
+    def initial(self, request, *args, **kwargs):
+        # Токен и права проверяются по основной базе.
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self._read_token = read_from(choose_replica(request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +60,19 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'foodgram.urls'
 
+# Асинхронные обработчики горячих GET-запросов (для запуска под ASGI)
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'false').lower() == 'true'
+
+# Замеры запросов (заголовок Server-Timing и /api/server-timing/): доля
+# замеряемых запросов и отдавать ли заголовок всем, а не только staff.
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.getenv('SERVER_TIMING_SAMPLE_RATE', '0.01')
+)
+SERVER_TIMING_PUBLIC = (
+    os.getenv('SERVER_TIMING_PUBLIC', 'false').lower() == 'true'
+)
+SERVER_TIMING_WINDOW = int(os.getenv('SERVER_TIMING_WINDOW', '500'))
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -91,6 +105,41 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: DB_REPLICAS=host1,host2 (для SQLite — пути
+# к файлам базы). Остальные параметры подключения берутся из default.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if 'sqlite' in DATABASES[alias]['ENGINE']:
+        DATABASES[alias]['NAME'] = location.strip()
+    else:
+        DATABASES[alias]['HOST'] = location.strip()
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает с основной базы
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+
+# Кэш. При нескольких воркерах нужен общий бэкенд (например, Redis):
+# версии данных из recipes.versions должны быть видны всем процессам.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# На сколько секунд счётчики избранного и корзин в ответах
+# (recipes.conditional) могут отставать
+COUNTERS_STALE_SECONDS = int(os.getenv('COUNTERS_STALE_SECONDS', '60'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,16 +166,22 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
 
     'PAGE_SIZE': 6,
 }
 
+# Кэш токенов (users.authentication): размер и TTL яруса в памяти
+# процесса, TTL общего кэша (0 — только локальный ярус).
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '1024'))
+AUTH_TOKEN_CACHE_LOCAL_TTL = int(os.getenv('AUTH_TOKEN_CACHE_LOCAL_TTL', '10'))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))
 
+
+# Один бэкенд: он же обслуживает вход по username (и в админку).
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
     'users.backends.EmailOrUsernameModelBackend',
 ]
 
@@ -166,5 +221,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Предел размера картинки в base64-полях (как client_max_body_size в nginx)
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -5,7 +5,10 @@ from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
 
+from foodgram import async_views
+from foodgram.instrumentation import ServerTimingSummaryView
 from users.views import UserViewSet
+from recipes.images import DERIVATIVES_DIR, variant_view
 from recipes.views import IngredientViewSet, RecipeViewSet
 
 router = DefaultRouter()
@@ -19,9 +22,25 @@ urlpatterns = [
     path('api/auth/', include('djoser.urls')),
     path('api/auth/', include('djoser.urls.authtoken')),
     path('api/auth/', include('djoser.urls.jwt')),
+    path(
+        'api/server-timing/',
+        ServerTimingSummaryView.as_view(),
+        name='server-timing'
+    ),
     path('api/', include(router.urls)),
+    # Копии картинок, которых ещё нет на диске (см. recipes.images).
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}{DERIVATIVES_DIR}/"
+        '<str:variant>/<path:name>',
+        variant_view,
+        name='image-variant'
+    ),
 ]
 
+if settings.ASYNC_READ_VIEWS:
+    # Под ASGI горячие GET-запросы обслуживаются асинхронно.
+    urlpatterns = async_views.urlpatterns + urlpatterns
+
 if settings.DEBUG:
     # Раздача медиа-файлов
     urlpatterns += static(
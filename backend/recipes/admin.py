@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Ingredient, Recipe, RecipeIngredient, Favorite
 from .models import ShoppingCart
+from .shopping_list import recipe_ingredients_changed
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -14,10 +15,32 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
+    list_display = ('name', 'author', 'favorites_count')
     search_fields = ('name', 'author__username')
     inlines = (RecipeIngredientInline,)
 
+    @staticmethod
+    def changed_ingredient_ids(formsets):
+        """Ингредиенты добавленных, изменённых и удалённых строк."""
+        ids = set()
+        for formset in formsets:
+            if formset.model is not RecipeIngredient:
+                continue
+            for inline_form in formset.forms:
+                if not inline_form.has_changed():
+                    continue
+                ids.add(inline_form.initial.get('ingredient'))
+                ingredient = inline_form.cleaned_data.get('ingredient')
+                ids.add(ingredient and ingredient.pk)
+        ids.discard(None)
+        return ids
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe_ingredients_changed(
+            form.instance.pk, self.changed_ingredient_ids(formsets)
+        )
+
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
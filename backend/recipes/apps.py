@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def create_search_table(sender, using, **kwargs):
+    from .search import ensure_sqlite_search_table
+    ensure_sqlite_search_table(using)
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(create_search_table, sender=self)
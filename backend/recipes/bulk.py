@@ -0,0 +1,86 @@
+"""
+Пачечное добавление и удаление рецептов в избранном и корзине.
+
+Вставка — один bulk_create(ignore_conflicts=True), он сигналов не шлёт.
+Удаление — QuerySet.delete(): сигналы уходят по каждой строке, но
+обработчики в recipes.signals внутри managed() ничего не делают. Так
+что счётчики рецептов пересчитываются здесь по факту, а список покупок
+и версии рецептов, зрителя и корзины обновляются явно, один раз на
+пачку.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .conditional import counters_changed, viewer_changed
+from .counters import actual_count
+from .models import Favorite, Recipe, ShoppingCart
+from .shopping_list import (
+    bump_cart_version,
+    recipe_ingredient_ids,
+    recipes_added_to_cart,
+    recipes_removed_from_cart
+)
+
+# Больше рецептов за один запрос не принимается.
+MAX_RECIPES = 100
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+_managed = ContextVar('bulk_managed', default=False)
+
+
+def managed():
+    """Запись идёт из этого модуля: обработчикам сигналов делать нечего."""
+    return _managed.get()
+
+
+@contextmanager
+def _managing():
+    token = _managed.set(True)
+    try:
+        yield
+    finally:
+        _managed.reset(token)
+
+
+def _changed(model, user, recipe_ids):
+    Recipe.objects.filter(pk__in=recipe_ids).update(**{
+        COUNTER_FIELDS[model]: actual_count(model, 'recipe')
+    })
+    counters_changed()
+    viewer_changed(user.pk)
+    if model is ShoppingCart:
+        transaction.on_commit(lambda: bump_cart_version(user.pk))
+
+
+@transaction.atomic
+def add_recipes(model, user, recipe_ids):
+    """Уже добавленные рецепты пропускаются."""
+    model.objects.bulk_create(
+        [model(user=user, recipe_id=pk) for pk in recipe_ids],
+        ignore_conflicts=True
+    )
+    _changed(model, user, recipe_ids)
+    if model is ShoppingCart:
+        recipes_added_to_cart(user.pk, recipe_ids)
+
+
+@transaction.atomic
+def remove_recipes(model, user, recipe_ids):
+    """Возвращает число удалённых строк."""
+    with _managing():
+        deleted, _ = model.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).delete()
+    if deleted:
+        _changed(model, user, recipe_ids)
+        if model is ShoppingCart:
+            recipes_removed_from_cart(
+                user.pk, recipe_ingredient_ids(recipe_ids)
+            )
+    return deleted
@@ -0,0 +1,167 @@
+"""
+Условные GET-запросы и кэш ответов для списка и карточки рецептов.
+
+Валидаторы ответа строятся из версий (recipes.versions): общей версии
+рецептов, справочника ингредиентов и, для авторизованных, версии
+зрителя — его избранного, корзины и подписок — и версии счётчиков
+избранного и корзин. ETag совпал — 304
+отдаётся до запросов к базе и сериализации. Данные ответов анонимам
+кэшируются под тем же ETag, поэтому смена любой версии их сбрасывает.
+Пока версия свежее REPLICA_PIN_SECONDS, данные читаются с основной
+базы: реплика могла ещё не получить изменения, а ответ уйдёт в кэш
+под новым ETag.
+
+Счётчики меняются при каждом добавлении в избранное или корзину, и
+общая версия от них не меняется: иначе кэш всех ответов сбрасывался бы
+на каждом клике. В валидаторы идёт устоявшаяся версия счётчиков
+(settled_counters_version), так что счётчики в ответах отстают не
+больше чем на COUNTERS_STALE_SECONDS.
+"""
+import hashlib
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+    quote_etag
+)
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from foodgram.replicas import primary_reads
+
+from .ingredient_index import VERSION_NAME as INGREDIENTS_VERSION
+from .versions import bump_version, get_version, version_time
+
+CONTENT_VERSION = 'recipes'
+COUNTERS_VERSION = 'recipes:counters'
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_PREFIX = 'recipes:response:'
+
+
+def viewer_version_name(user_id):
+    return f'viewer:{user_id}'
+
+
+def content_changed():
+    """Рецепты, их ингредиенты или данные авторов изменились."""
+    transaction.on_commit(lambda: bump_version(CONTENT_VERSION))
+
+
+def counters_changed():
+    """Изменились счётчики избранного или корзин рецептов."""
+    transaction.on_commit(lambda: bump_version(COUNTERS_VERSION))
+
+
+def viewer_changed(user_id):
+    """Изменились избранное, корзина или подписки пользователя."""
+    transaction.on_commit(
+        lambda: bump_version(viewer_version_name(user_id))
+    )
+
+
+def version_names(user):
+    """Версии ответа; версия счётчиков всегда последняя."""
+    names = [CONTENT_VERSION, INGREDIENTS_VERSION]
+    if user.is_authenticated:
+        names.append(viewer_version_name(user.pk))
+    names.append(COUNTERS_VERSION)
+    return names
+
+
+def settled_counters_version(version):
+    """
+    Версия счётчиков для валидаторов: начало интервала длиной
+    COUNTERS_STALE_SECONDS, в котором счётчики менялись последний раз,
+    а когда он закончился — начало следующего. Внутри интервала она
+    не зависит от числа кликов, и смена счётчиков попадает в ответы
+    не позже начала следующего интервала.
+    """
+    period = settings.COUNTERS_STALE_SECONDS
+    interval = int(version_time(version) // period)
+    if time.time() >= (interval + 1) * period:
+        interval += 1
+    return f'{interval * period:.6f}-counters'
+
+
+def make_validators(versions, url, media_type):
+    """
+    versions — в порядке version_names(). url — полный адрес запроса:
+    в ответах абсолютные ссылки на картинки, поэтому хост и схема
+    входят в ETag и ключ кэша.
+    """
+    versions = [*versions[:-1], settled_counters_version(versions[-1])]
+    digest = hashlib.md5('\n'.join((
+        *versions, url, media_type or ''
+    )).encode()).hexdigest()
+    return quote_etag(digest), max(map(version_time, versions))
+
+
+def response_validators(request):
+    """ETag и Last-Modified ответа на этот запрос."""
+    versions = [get_version(name) for name in version_names(request.user)]
+    return make_validators(
+        versions, request.build_absolute_uri(), request.accepted_media_type
+    )
+
+
+def reads_for(last_modified):
+    """
+    Чтение с основной базы, если реплики могли ещё не получить
+    изменения этой версии.
+    """
+    if time.time() - last_modified < settings.REPLICA_PIN_SECONDS:
+        return primary_reads()
+    return nullcontext()
+
+
+def add_validators(response, user, etag, last_modified):
+    if response.status_code in (status.HTTP_200_OK,
+                                status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    if user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_response(request, get_response):
+    """
+    Отдаёт 304, закэшированные данные (анонимам) или результат
+    get_response() с заголовками ETag и Last-Modified.
+    """
+    etag, last_modified = response_validators(request)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        with reads_for(last_modified):
+            if request.user.is_authenticated:
+                response = get_response()
+            else:
+                response = _cached_response(etag, get_response)
+    return add_validators(response, request.user, etag, last_modified)
+
+
+def response_cache_key(etag):
+    return RESPONSE_CACHE_PREFIX + etag
+
+
+def _cached_response(etag, get_response):
+    key = response_cache_key(etag)
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+    response = get_response()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,44 @@
+"""
+Денормализованные счётчики: Recipe.favorites_count,
+Recipe.shopping_cart_count и Profile.recipes_count.
+
+Счётчики меняются только атомарным UPDATE с F() (см. recipes.signals)
+или пересчётом по факту (пачечные операции, recipes.bulk), а обычный
+save() их не записывает, чтобы не затереть чужое изменение значением,
+прочитанным раньше. Расхождения исправляет команда reconcile_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class CounterFieldsMixin:
+    """Исключает counter_fields из save() уже существующей записи."""
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+def change_counter(queryset, field, delta):
+    """
+    Прибавляет delta к счётчику, не опуская его ниже нуля. Возвращает
+    число изменённых строк.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(model, field, outer='pk'):
+    """Подзапрос: сколько строк model ссылаются полем field на запись."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)}).order_by().values(
+            field
+        ).annotate(total=Count('id')).values('total')
+    ), 0)
@@ -0,0 +1,44 @@
+"""
+Материализованная лента подписок (FeedEntry).
+
+Новый рецепт раскладывается по лентам подписчиков автора в той же
+транзакции; подписка добавляет в ленту рецепты автора, отписка их
+убирает. Вызывается из recipes.signals.
+"""
+from users.models import Subscription
+
+from .models import FeedEntry, Recipe
+
+BATCH_SIZE = 1000
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(recipe):
+    follower_ids = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    recipe_ids = Recipe.objects.filter(
+        author_id=author_id
+    ).values_list('id', flat=True)
+    _insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id)
+        for recipe_id in recipe_ids.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
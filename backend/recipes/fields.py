@@ -1,19 +1,84 @@
 import base64
+import binascii
 import uuid
-from django.core.files.base import ContentFile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile,
+    TemporaryUploadedFile
+)
 from rest_framework import serializers
 
+BASE64_MARKER = ';base64,'
+# Кратно 4, чтобы куски base64 декодировались независимо.
+DECODE_CHUNK_SIZE = 64 * 1024
+_STRIP_WHITESPACE = str.maketrans('', '', ' \t\r\n')
+
 
 class Base64ImageField(serializers.ImageField):
     """
-    Кастомное поле для декодирования base64-картинок
+    Кастомное поле для декодирования base64-картинок.
+
+    Размер проверяется по длине строки ещё до декодирования. Данные
+    декодируются кусками: небольшие картинки — в память, крупнее
+    FILE_UPLOAD_MAX_MEMORY_SIZE — во временный файл, как обычные загрузки.
     """
+    default_error_messages = {
+        'too_large': (
+            'Размер картинки не должен превышать {max_size} байт.'
+        ),
+        'invalid_base64': 'Некорректные данные base64.',
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            imgstr = imgstr.replace('\n', '').replace('\r', '')
-            name = f"{uuid.uuid4()}.{ext}"
-            data = ContentFile(base64.b64decode(imgstr), name=name)
+            data = self._decode(data)
         return super().to_internal_value(data)
+
+    def _decode(self, data):
+        marker = data.find(BASE64_MARKER)
+        if marker == -1:
+            self.fail('invalid_image')
+        content_type = data[len('data:'):marker]
+        ext = content_type.split('/')[-1]
+        start = marker + len(BASE64_MARKER)
+
+        max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        encoded_length = (
+            len(data) - start
+            - data.count('\n', start) - data.count('\r', start)
+        )
+        if encoded_length // 4 * 3 - 2 > max_size:
+            self.fail('too_large', max_size=max_size)
+
+        name = f"{uuid.uuid4()}.{ext}"
+        if encoded_length // 4 * 3 > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            upload = TemporaryUploadedFile(name, content_type, 0, None)
+        else:
+            upload = InMemoryUploadedFile(
+                BytesIO(), None, name, content_type, 0, None
+            )
+        size = 0
+        pending = ''
+        try:
+            for position in range(start, len(data), DECODE_CHUNK_SIZE):
+                chunk = pending + data[
+                    position:position + DECODE_CHUNK_SIZE
+                ].translate(_STRIP_WHITESPACE)
+                usable = len(chunk) - len(chunk) % 4
+                pending = chunk[usable:]
+                size += upload.write(
+                    base64.b64decode(chunk[:usable], validate=True)
+                )
+            if pending:
+                size += upload.write(base64.b64decode(pending, validate=True))
+        except binascii.Error:
+            upload.close()
+            self.fail('invalid_base64')
+        if size > max_size:
+            upload.close()
+            self.fail('too_large', max_size=max_size)
+        upload.size = size
+        upload.seek(0)
+        return upload
@@ -1,8 +1,10 @@
 # recipes/filters.py
 
 import django_filters
+from rest_framework import filters
 
 from .models import Recipe
+from .search import search_recipes
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -38,3 +40,29 @@ class RecipeFilter(django_filters.FilterSet):
             return queryset.filter(in_shopping_carts__user=user)
         # при false — исключаем
         return queryset.exclude(in_shopping_carts__user=user)
+
+
+class RecipeSearchFilter(filters.SearchFilter):
+    """
+    ?search= по названию и автору через индексы (см. recipes.search),
+    результаты упорядочены по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_recipes(queryset, terms)
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    """
+    ?ordering=-favorites_count и т.п.; при равных значениях новые
+    рецепты идут первыми, чтобы страницы не перемешивались.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {'id', '-id'} & set(ordering):
+            ordering = [*ordering, '-id']
+        return ordering
@@ -0,0 +1,128 @@
+"""
+Уменьшенные копии картинок рецептов и аватаров в WebP.
+
+Копии лежат в MEDIA_ROOT/derivatives/<вариант>/; имя выводится из имени
+оригинала, поэтому новая картинка всегда получает новые копии, а URL
+копии строится без обращения к хранилищу. Копии делаются сразу после
+сохранения картинки (recipes.signals). Если копии нет — старая картинка
+или копию не удалось сделать, — запрос к ней nginx передаёт в
+variant_view: та делает копию или, если оригинал не прочитать,
+перенаправляет на оригинал. Неудача запоминается и не повторяется.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from PIL import Image, ImageOps
+
+from .storage import media_storage, upload_directories
+
+logger = logging.getLogger(__name__)
+
+# Вариант: максимальные ширина и высота.
+IMAGE_VARIANTS = {
+    'avatar': (160, 160),
+    'thumbnail': (320, 320),
+    'card': (640, 640),
+    'full': (1600, 1600),
+}
+RECIPE_VARIANTS = ('thumbnail', 'card', 'full')
+AVATAR_VARIANTS = ('avatar',)
+WEBP_QUALITY = 80
+DERIVATIVES_DIR = 'derivatives'
+FAILED_KEY_PREFIX = 'images:failed:'
+FAILED_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def variant_name(name, variant):
+    return os.path.join(
+        DERIVATIVES_DIR, variant, os.path.splitext(name)[0] + '.webp'
+    )
+
+
+def _failed_key(name):
+    return FAILED_KEY_PREFIX + name
+
+
+def _render_variant(storage, name, size):
+    with storage.open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if 'transparency' in image.info else 'RGB'
+            )
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def make_variant(storage, name, variant):
+    """Имя готовой копии в default_storage или None, если её не сделать."""
+    target = variant_name(name, variant)
+    if default_storage.exists(target):
+        return target
+    if cache.get(_failed_key(name)):
+        return None
+    try:
+        content = _render_variant(storage, name, IMAGE_VARIANTS[variant])
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Не удалось сделать копию %s для %s', variant, name)
+        cache.set(_failed_key(name), True, FAILED_TIMEOUT)
+        return None
+    if not default_storage.exists(target):
+        default_storage.save(target, ContentFile(content))
+    return target
+
+
+def make_variants(field_file, variants):
+    """Делает копии только что сохранённой картинки."""
+    if not field_file or not field_file.name:
+        return
+    for variant in variants:
+        if make_variant(field_file.storage, field_file.name, variant) is None:
+            return
+
+
+def variant_url(field_file, variant, request=None):
+    if not field_file or not field_file.name:
+        return None
+    url = default_storage.url(variant_name(field_file.name, variant))
+    return request.build_absolute_uri(url) if request else url
+
+
+def _find_original(stem):
+    """Имя оригинала в media_storage по имени без расширения."""
+    directory, basename = os.path.split(stem)
+    try:
+        _, files = media_storage.listdir(directory)
+    except FileNotFoundError:
+        return None
+    for filename in files:
+        if os.path.splitext(filename)[0] == basename:
+            return os.path.join(directory, filename)
+    return None
+
+
+def variant_view(request, variant, name):
+    """
+    GET /media/derivatives/<вариант>/<имя>.webp, которого нет на диске.
+    """
+    stem, ext = os.path.splitext(name)
+    if (variant not in IMAGE_VARIANTS or ext != '.webp'
+            or '..' in stem.split('/')
+            or not stem.startswith(tuple(upload_directories()))):
+        raise Http404
+    original = _find_original(stem)
+    if original is None:
+        raise Http404
+    target = make_variant(media_storage, original, variant)
+    if target is None:
+        return HttpResponseRedirect(media_storage.url(original))
+    return FileResponse(
+        default_storage.open(target, 'rb'), content_type='image/webp'
+    )
@@ -0,0 +1,80 @@
+"""
+Индекс ингредиентов в памяти процесса для автодополнения.
+
+Справочник небольшой и почти не меняется, поэтому поиск по началу
+названия (?name=) обслуживается отсортированным списком регистронезависимых
+ключей и bisect, без запроса к базе. Индекс строится лениво при первом
+обращении и перестраивается, когда меняется версия 'ingredients'
+(сигналы Ingredient и команды импорта).
+"""
+import threading
+from bisect import bisect_left
+
+from foodgram.replicas import primary_reads
+
+from .models import Ingredient
+from .versions import bump_version, get_version
+
+VERSION_NAME = 'ingredients'
+
+
+class _Snapshot:
+
+    def __init__(self, version, ingredients):
+        self.version = version
+        # Позиция в выдаче базы — сортировка Meta.ordering (по name)
+        # делается правилами сортировки СУБД, а не Python.
+        self.ordered = ingredients
+        self.by_id = {ingredient.pk: ingredient for ingredient in ingredients}
+        entries = sorted(
+            (ingredient.name.casefold(), position)
+            for position, ingredient in enumerate(ingredients)
+        )
+        self.keys = [key for key, _ in entries]
+        self.positions = [position for _, position in entries]
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _get_snapshot(self):
+        version = get_version(VERSION_NAME)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                # Снимок живёт до следующей смены версии: реплика могла
+                # ещё не получить изменения, из-за которых версия сменилась.
+                with primary_reads():
+                    ingredients = list(Ingredient.objects.all())
+                snapshot = _Snapshot(version, ingredients)
+                self._snapshot = snapshot
+        return snapshot
+
+    def all(self):
+        return list(self._get_snapshot().ordered)
+
+    def search(self, prefix):
+        """Аналог name__istartswith в порядке Ingredient.Meta.ordering."""
+        snapshot = self._get_snapshot()
+        prefix = prefix.casefold()
+        keys = snapshot.keys
+        positions = []
+        for index in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[index].startswith(prefix):
+                break
+            positions.append(snapshot.positions[index])
+        positions.sort()
+        return [snapshot.ordered[position] for position in positions]
+
+    def invalidate(self):
+        self._snapshot = None
+        bump_version(VERSION_NAME)
+
+
+ingredient_index = IngredientIndex()
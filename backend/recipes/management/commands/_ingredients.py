@@ -0,0 +1,141 @@
+"""
+Общая часть команд импорта ингредиентов: файл читается потоково,
+строки пишутся пачками через bulk_create(ignore_conflicts=True), опираясь
+на уникальность (name, measurement_unit), всё в одной транзакции.
+"""
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+READ_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = re.compile(r'\s*')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """
+    Элементы JSON-массива верхнего уровня по одному, не загружая файл
+    в память целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    expected = '['
+
+    def read_more():
+        nonlocal buffer, position
+        chunk = file.read(chunk_size)
+        if not chunk:
+            raise CommandError('Файл оборвался посреди JSON-массива.')
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    while True:
+        position = _WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            read_more()
+            continue
+        char = buffer[position]
+        if expected == '[':
+            if char != '[':
+                raise CommandError('Ожидался JSON-массив.')
+            position += 1
+            expected = 'item'
+            continue
+        if char == ']':
+            return
+        if expected == ',':
+            if char != ',':
+                raise CommandError(
+                    f'Некорректный JSON рядом с символом {char!r}.'
+                )
+            position += 1
+            expected = 'item'
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            read_more()
+            continue
+        if end == len(buffer):
+            # Число или литерал мог оборваться на границе куска.
+            read_more()
+            continue
+        yield item
+        position = end
+        expected = ','
+
+
+class IngredientImportCommand(ABC, BaseCommand):
+    default_filename = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=str,
+            help='Путь к файлу с ингредиентами'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк записывать за один запрос'
+        )
+
+    @abstractmethod
+    def read_rows(self, file):
+        """Пары (name, measurement_unit) из открытого файла."""
+
+    def handle(self, *args, **options):
+        path = options['path'] or os.path.join(
+            settings.BASE_DIR, '..', 'data', self.default_filename
+        )
+        path = os.path.abspath(path)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        processed = 0
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            before = Ingredient.objects.count()
+            rows = self._clean(self.read_rows(file))
+            for batch in batched(rows, batch_size):
+                Ingredient.objects.bulk_create(
+                    [
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in batch
+                    ],
+                    ignore_conflicts=True
+                )
+                processed += len(batch)
+                if options['verbosity'] >= 1:
+                    self.stdout.write(f'Обработано строк: {processed}')
+            count = Ingredient.objects.count() - before
+        ingredient_index.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Импортировано ингредиентов: {count} '
+                f'(обработано строк: {processed})'
+            )
+        )
+
+    @staticmethod
+    def _clean(rows):
+        for name, unit in rows:
+            name = (name or '').strip()
+            unit = (unit or '').strip()
+            if name and unit:
+                yield name, unit
@@ -0,0 +1,126 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from recipes.views import RecipeViewSet
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер числа SQL-запросов и времени ответа /api/recipes/ '
+        'для разных размеров страницы. Данные создаются во временной '
+        'транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100,
+            help='Сколько рецептов создать для замера'
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=10,
+            help='Ингредиентов в каждом рецепте'
+        )
+        parser.add_argument(
+            '--limits',
+            type=str,
+            default='1,6,25,100',
+            help='Размеры страниц через запятую'
+        )
+
+    def handle(self, *args, **options):
+        limits = [int(limit) for limit in options['limits'].split(',')]
+        with transaction.atomic():
+            viewer = self._populate(options['recipes'], options['ingredients'])
+            self.stdout.write(
+                f'{"limit":>6} {"viewer":>8} {"queries":>8} {"ms":>9}'
+            )
+            for limit in limits:
+                for label, user in (
+                    ('anon', AnonymousUser()),
+                    ('auth', viewer),
+                ):
+                    queries, elapsed = self._measure(user, limit)
+                    self.stdout.write(
+                        f'{limit:>6} {label:>8} {queries:>8} '
+                        f'{elapsed * 1000:>9.1f}'
+                    )
+            transaction.set_rollback(True)
+
+    def _populate(self, recipes_count, ingredients_count):
+        author = User.objects.create_user(
+            username='benchmark_author',
+            email='benchmark_author@example.com',
+            password='benchmark',
+        )
+        viewer = User.objects.create_user(
+            username='benchmark_viewer',
+            email='benchmark_viewer@example.com',
+            password='benchmark',
+        )
+        Subscription.objects.create(user=viewer, author=author)
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'benchmark ingredient {i}',
+                measurement_unit='г'
+            )
+            for i in range(ingredients_count)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'benchmark recipe {i}',
+                image='recipes/images/benchmark.jpg',
+                text='benchmark',
+                cooking_time=10,
+            )
+            for i in range(recipes_count)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in ingredients
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=viewer, recipe=recipe) for recipe in recipes[::2]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=viewer, recipe=recipe)
+            for recipe in recipes[::3]
+        )
+        return viewer
+
+    def _measure(self, user, limit):
+        host = next(iter(settings.ALLOWED_HOSTS), 'localhost').lstrip('.')
+        request = APIRequestFactory().get(
+            '/api/recipes/', {'limit': limit}, HTTP_HOST=host
+        )
+        if user.is_authenticated:
+            force_authenticate(request, user=user)
+        view = RecipeViewSet.as_view({'get': 'list'})
+        with CaptureQueriesContext(connection) as ctx:
+            started = perf_counter()
+            response = view(request)
+            response.render()
+            elapsed = perf_counter() - started
+        return len(ctx.captured_queries), elapsed
@@ -0,0 +1,205 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe
+
+User = get_user_model()
+
+SERVERS = {
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', 'foodgram.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+        '--log-level', 'warning',
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'foodgram.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(workers), '--log-level', 'warning',
+        '--no-access-log',
+    ],
+}
+STARTUP_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError('Сервер не запустился')
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и задержки горячих GET-запросов '
+        'под gunicorn (WSGI, синхронные вьюсеты) и uvicorn (ASGI, '
+        'ASYNC_READ_VIEWS=true) при одинаковом числе воркеров. Работает '
+        'с текущей базой, её нужно заранее наполнить данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=32,
+            help='Сколько клиентов шлют запросы одновременно'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=15,
+            help='Длительность замера для каждого сервера, секунд'
+        )
+        parser.add_argument(
+            '--user',
+            help='Слать запросы с токеном этого пользователя'
+        )
+        parser.add_argument(
+            '--servers',
+            nargs='+',
+            choices=sorted(SERVERS),
+            default=['wsgi', 'asgi']
+        )
+
+    def handle(self, *args, **options):
+        paths = self._paths()
+        headers = {'Accept': 'application/json', 'Host': self._host()}
+        if options['user']:
+            user = User.objects.get(username=options['user'])
+            token, _ = Token.objects.get_or_create(user=user)
+            headers['Authorization'] = f'Token {token.key}'
+
+        self.stdout.write(
+            f"Воркеров: {options['workers']}, клиентов: "
+            f"{options['concurrency']}, {options['duration']} с на сервер"
+        )
+        for name in options['servers']:
+            latencies, errors, elapsed = self._run_server(
+                name, paths, headers, options
+            )
+            latencies.sort()
+            if not latencies:
+                raise CommandError(f'{name}: ни одного успешного ответа')
+            self.stdout.write(
+                f'{name}: {len(latencies) / elapsed:.1f} req/s, '
+                f'p50 {percentile(latencies, 0.5) * 1000:.1f} ms, '
+                f'p99 {percentile(latencies, 0.99) * 1000:.1f} ms, '
+                f'ошибок {errors}'
+            )
+
+    def _host(self):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        return hosts[0].lstrip('.') if hosts else 'localhost'
+
+    def _paths(self):
+        recipe = Recipe.objects.order_by('-id').first()
+        ingredient = Ingredient.objects.first()
+        if recipe is None or ingredient is None:
+            raise CommandError('В базе нет рецептов или ингредиентов')
+        return [
+            '/api/recipes/',
+            '/api/recipes/?limit=6&offset=6',
+            f'/api/recipes/{recipe.pk}/',
+            f'/api/ingredients/?name={quote(ingredient.name[:2])}',
+            f'/api/users/{recipe.author_id}/',
+        ]
+
+    def _run_server(self, name, paths, headers, options):
+        port = free_port()
+        env = dict(
+            os.environ,
+            ASYNC_READ_VIEWS='true' if name == 'asgi' else 'false',
+            DJANGO_SETTINGS_MODULE=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'foodgram.settings'
+            ),
+        )
+        process = subprocess.Popen(
+            SERVERS[name](port, options['workers']),
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        try:
+            wait_for_port(port, process)
+            # Прогрев: импорты, соединения с БД, кэши.
+            self._load(port, paths, headers, options['concurrency'], 2)
+            return self._load(
+                port, paths, headers,
+                options['concurrency'], options['duration']
+            )
+        finally:
+            process.terminate()
+            process.wait()
+
+    def _load(self, port, paths, headers, concurrency, duration):
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client(offset):
+            nonlocal errors
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            own = []
+            failed = 0
+            for path in cycle(paths[offset:] + paths[:offset]):
+                if time.monotonic() >= deadline:
+                    break
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = http.client.HTTPConnection(
+                        '127.0.0.1', port
+                    )
+                    failed += 1
+                    continue
+                if response.status == 200:
+                    own.append(time.perf_counter() - started)
+                else:
+                    failed += 1
+            connection.close()
+            with lock:
+                latencies.extend(own)
+                errors += failed
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(concurrency) as pool:
+            futures = [
+                pool.submit(client, number % len(paths))
+                for number in range(concurrency)
+            ]
+        for future in futures:
+            future.result()
+        return latencies, errors, time.monotonic() - started
@@ -0,0 +1,76 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import DERIVATIVES_DIR, IMAGE_VARIANTS
+from recipes.storage import media_storage, reference_counts, upload_directories
+
+
+def walk(storage, directory):
+    """Имена всех файлов в каталоге хранилища, рекурсивно."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for name in directories:
+        yield from walk(storage, os.path.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один рецепт '
+        'или профиль, и их уменьшенные копии'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=24,
+            help='Не трогать файлы, изменённые за последние N часов',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что было бы удалено',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        referenced = set(reference_counts())
+        referenced_stems = {os.path.splitext(name)[0] for name in referenced}
+
+        removed = 0
+        for directory in upload_directories():
+            for name in walk(media_storage, directory):
+                if name in referenced:
+                    continue
+                if self._collect(media_storage, name, cutoff, dry_run):
+                    removed += 1
+
+        for variant in IMAGE_VARIANTS:
+            prefix = os.path.join(DERIVATIVES_DIR, variant)
+            for name in walk(default_storage, prefix):
+                original = os.path.relpath(name, prefix)
+                if os.path.splitext(original)[0] in referenced_stems:
+                    continue
+                if self._collect(default_storage, name, cutoff, dry_run):
+                    removed += 1
+
+        verb = 'Будет удалено' if dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} файлов: {removed}'))
+
+    def _collect(self, storage, name, cutoff, dry_run):
+        if storage.get_modified_time(name) > cutoff:
+            return False
+        if self.verbosity >= 2 or dry_run:
+            self.stdout.write(name)
+        if not dry_run:
+            getattr(storage, 'purge', storage.delete)(name)
+        return True
@@ -1,37 +1,14 @@
 import csv
-import os
 
-from django.conf import settings
-from django.core.management.base import BaseCommand
+from ._ingredients import IngredientImportCommand
 
-from recipes.models import Ingredient
 
-
-class Command(BaseCommand):
+class Command(IngredientImportCommand):
     help = 'Импорт ингредиентов из CSV-файла в базу данных'
+    default_filename = 'ingredients.csv'
 
-    def add_arguments(self, parser):
-        parser.add_argument(
-            '--path',
-            type=str,
-            help='Путь к CSV-файлу с ингредиентами'
-        )
-
-    def handle(self, *args, **options):
-        path = options['path'] or os.path.join(
-            settings.BASE_DIR, '..', 'data', 'ingredients.csv'
-        )
-        path = os.path.abspath(path)
-        count = 0
-        with open(path, encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                obj, created = Ingredient.objects.get_or_create(
-                    name=row['name'].strip(),
-                    measurement_unit=row['measurement_unit'].strip(),
-                )
-                if created:
-                    count += 1
-        self.stdout.write(
-            self.style.SUCCESS(f'Импортировано ингредиентов: {count}')
-        )
+    def read_rows(self, file):
+        for row in csv.reader(file):
+            if len(row) < 2 or row[:2] == ['name', 'measurement_unit']:
+                continue
+            yield row[0], row[1]
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.conditional import content_changed
+from recipes.counters import actual_count
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного, корзин и рецептов авторов '
+        'и исправляет разошедшиеся'
+    )
+
+    def handle(self, *args, **options):
+        counters = (
+            (Recipe, 'favorites_count', actual_count(Favorite, 'recipe')),
+            (
+                Recipe, 'shopping_cart_count',
+                actual_count(ShoppingCart, 'recipe')
+            ),
+            (
+                Profile, 'recipes_count',
+                actual_count(Recipe, 'author', outer='user')
+            ),
+        )
+        total = 0
+        for model, field, actual in counters:
+            drifted = model.objects.annotate(actual=actual).exclude(
+                **{field: F('actual')}
+            ).values('pk')
+            fixed = model.objects.filter(pk__in=drifted).update(
+                **{field: actual}
+            )
+            total += fixed
+            self.stdout.write(
+                f'{model._meta.label}.{field}: исправлено {fixed}'
+            )
+        if total:
+            # Счётчики отдаются в ответах, закэшированных под версией.
+            content_changed()
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
@@ -0,0 +1,42 @@
+# Триграммные индексы для поиска рецептов (только PostgreSQL).
+# Выражения совпадают с тем, что Django генерирует для icontains:
+# UPPER("name"::text) LIKE UPPER(%s). Для SQLite поисковая таблица
+# создаётся после migrate (recipes.search.ensure_sqlite_search_table).
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    users = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipes_recipe_name_trgm '
+        'ON recipes_recipe USING gin ((UPPER(name::text)) gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipes_author_username_trgm '
+        f'ON {schema_editor.quote_name(users)} '
+        'USING gin ((UPPER(username::text)) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipes_recipe_name_trgm')
+    schema_editor.execute('DROP INDEX IF EXISTS recipes_author_username_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppingcart'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
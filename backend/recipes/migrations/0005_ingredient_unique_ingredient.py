@@ -0,0 +1,53 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Перед добавлением уникальности сводит дубли ингредиентов к одной
+    записи: ссылки из рецептов переносятся на оставшийся ингредиент.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        kept_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for group in duplicates:
+        kept_id = group['kept_id']
+        extra_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=kept_id).values_list('id', flat=True))
+        for extra_id in extra_ids:
+            RecipeIngredient.objects.filter(
+                ingredient_id=extra_id,
+                recipe_id__in=RecipeIngredient.objects.filter(
+                    ingredient_id=kept_id
+                ).values('recipe_id')
+            ).delete()
+            RecipeIngredient.objects.filter(
+                ingredient_id=extra_id
+            ).update(ingredient_id=kept_id)
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            ),
+        ),
+    ]
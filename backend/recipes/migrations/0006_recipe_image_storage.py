@@ -0,0 +1,21 @@
+import recipes.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(
+                storage=recipes.storage.ContentAddressedStorage(),
+                upload_to='recipes/images/',
+                verbose_name='Картинка'
+            ),
+        ),
+    ]
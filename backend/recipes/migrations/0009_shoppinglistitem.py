@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_shopping_lists(apps, schema_editor):
+    """Собирает списки покупок по уже существующим корзинам."""
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    totals = RecipeIngredient.objects.filter(
+        recipe__in_shopping_carts__isnull=False
+    ).values_list(
+        'recipe__in_shopping_carts__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total
+            )
+            for user_id, ingredient_id, total in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField()),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Строка списка покупок',
+                'verbose_name_plural': 'Списки покупок',
+                'ordering': ['ingredient__name'],
+                'unique_together': {('user', 'ingredient')},
+            },
+        ),
+        migrations.RunPython(backfill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models import Prefetch
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .counters import CounterFieldsMixin
+from .storage import media_storage
+
 User = get_user_model()
 
 COOKING_TIME_MIN = 1
@@ -25,12 +29,40 @@ class Ingredient(models.Model):
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.measurement_unit})"
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_read_data(self):
+        """
+        Всё, что нужно RecipeReadSerializer, за фиксированное число
+        запросов: автор с профилем и ингредиенты подгружаются заранее.
+        Флаги избранного, корзины и подписки берутся из связей зрителя
+        (recipes.viewer).
+        """
+        return self.prefetch_related(
+            Prefetch(
+                'author', queryset=User.objects.select_related('profile')
+            ),
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,6 +75,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/images/',
+        storage=media_storage,
         verbose_name="Картинка"
     )
     text = models.TextField(
@@ -61,11 +94,30 @@ class Recipe(models.Model):
             MaxValueValidator(COOKING_TIME_MAX),
         ]
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="В избранном"
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="В корзинах"
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'shopping_cart_count')
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popularity_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -148,3 +200,59 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"{self.user} — {self.recipe}"
+
+
+class FeedEntry(models.Model):
+    """
+    Лента подписок: строка на каждый рецепт автора, на которого подписан
+    пользователь. Заполняется при записи (см. recipes.feed), чтение —
+    один проход по индексу (user, recipe).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        unique_together = ('user', 'recipe')
+        ordering = ['-recipe_id']
+
+    def __str__(self):
+        return f"{self.user} — {self.recipe}"
+
+
+class ShoppingListItem(models.Model):
+    """
+    Список покупок: сколько ингредиента нужно на все рецепты корзины
+    пользователя. Поддерживается при записи (см.
+    recipes.shopping_list.refresh_shopping_lists), чтение — проход по
+    индексу (user, ingredient).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items'
+    )
+    amount = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        unique_together = ('user', 'ingredient')
+        ordering = ['ingredient__name']
+
+    def __str__(self):
+        return f"{self.user} — {self.ingredient}: {self.amount}"
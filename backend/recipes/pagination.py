@@ -0,0 +1,50 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+from users.pagination import CachedCountMixin
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Пагинация по ключу id: страница берётся условием id < последнего
+    на прошлой странице, без OFFSET и COUNT(*), и не сдвигается от
+    новых рецептов.
+    """
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """
+    Курсор по записям FeedEntry пользователя. Порядок постоянный:
+    ?ordering= из фильтров рецептов к ленте не относится.
+    """
+    ordering = '-recipe_id'
+
+    def get_ordering(self, request, queryset, view):
+        return (self.ordering,)
+
+
+class RecipePagination(CachedCountMixin, LimitOffsetPagination):
+    """
+    По умолчанию limit/offset, как ждёт фронтенд. С параметром ?cursor=
+    (для первой страницы — пустым) ответ строится курсорной пагинацией:
+    {"next", "previous", "results"} без count.
+    """
+    cursor_query_param = 'cursor'
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = RecipeCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
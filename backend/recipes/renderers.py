@@ -0,0 +1,28 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class _DownloadRenderer(BaseRenderer):
+    """
+    Нужен, чтобы ?format=txt|pdf проходил согласование контента DRF.
+    Сам файл отдаётся готовым HttpResponse, а через рендерер проходят
+    только ответы с ошибками.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class PlainTextRenderer(_DownloadRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+
+class PDFRenderer(_DownloadRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
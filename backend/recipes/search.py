@@ -0,0 +1,147 @@
+"""
+Поиск рецептов по названию и имени автора (?search=).
+
+PostgreSQL: триграммные GIN-индексы (миграция 0004) обслуживают
+icontains-фильтр, результаты сортируются по триграммному сходству.
+SQLite: теневая FTS5-таблица с триграммным токенизатором, которую
+поддерживают триггеры; сортировка по bm25. На остальных СУБД остаётся
+обычный icontains без ранжирования.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'recipes_recipe_fts'
+# Триграммный токенизатор не находит строки короче трёх символов.
+FTS_MIN_TERM_LENGTH = 3
+
+_fts_available = {}
+
+
+def _term_filter(term):
+    return Q(name__icontains=term) | Q(author__username__icontains=term)
+
+
+def search_recipes(queryset, terms):
+    """
+    Каждое слово должно встречаться в названии или имени автора.
+    Возвращает queryset с аннотацией search_rank (больше — релевантнее).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(queryset, terms)
+    if connection.vendor == 'sqlite' and _has_fts_table(connection):
+        return _search_sqlite(queryset, terms)
+    for term in terms:
+        queryset = queryset.filter(_term_filter(term))
+    return queryset
+
+
+def _search_postgresql(queryset, terms):
+    from django.contrib.postgres.search import TrigramSimilarity
+    from django.db.models.functions import Greatest
+
+    for term in terms:
+        queryset = queryset.filter(_term_filter(term))
+    rank = sum(
+        Greatest(
+            TrigramSimilarity('name', term),
+            TrigramSimilarity('author__username', term),
+        )
+        for term in terms
+    )
+    return queryset.annotate(search_rank=rank).order_by(
+        F('search_rank').desc(), '-id'
+    )
+
+
+def _search_sqlite(queryset, terms):
+    fts_terms = []
+    for term in terms:
+        if len(term) >= FTS_MIN_TERM_LENGTH:
+            fts_terms.append(term)
+        else:
+            queryset = queryset.filter(_term_filter(term))
+    if not fts_terms:
+        return queryset
+    match = ' '.join(
+        '"{}"'.format(term.replace('"', '""')) for term in fts_terms
+    )
+    table = queryset.model._meta.db_table
+    matched = RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,)
+    )
+    rank = RawSQL(
+        f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+        (match,),
+        output_field=FloatField(),
+    )
+    return queryset.filter(id__in=matched).annotate(
+        search_rank=rank
+    ).order_by(F('search_rank').desc(), '-id')
+
+
+def _has_fts_table(connection):
+    if connection.alias not in _fts_available:
+        _fts_available[connection.alias] = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[connection.alias]
+
+
+def ensure_sqlite_search_table(using):
+    """
+    Создаёт FTS5-таблицу и триггеры для SQLite.
+
+    Вызывается после каждого migrate: SQLite пересоздаёт таблицу рецептов
+    при многих изменениях схемы, и её триггеры при этом пропадают.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    recipes = 'recipes_recipe'
+    users = get_user_model()._meta.db_table
+    existing = connection.introspection.table_names()
+    if recipes not in existing:
+        return
+    with connection.cursor() as cursor:
+        if FTS_TABLE not in existing:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} '
+                f"USING fts5(name, username, tokenize='trigram')"
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, name, username) '
+                f'SELECT r.id, r.name, u.username FROM {recipes} r '
+                f'JOIN {users} u ON u.id = r.author_id'
+            )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert '
+            f'AFTER INSERT ON {recipes} BEGIN '
+            f'INSERT INTO {FTS_TABLE}(rowid, name, username) '
+            f'SELECT new.id, new.name, username FROM {users} '
+            f'WHERE id = new.author_id; END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update '
+            f'AFTER UPDATE OF name, author_id ON {recipes} BEGIN '
+            f'UPDATE {FTS_TABLE} SET name = new.name, username = '
+            f'(SELECT username FROM {users} WHERE id = new.author_id) '
+            f'WHERE rowid = new.id; END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete '
+            f'AFTER DELETE ON {recipes} BEGIN '
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_username '
+            f'AFTER UPDATE OF username ON {users} BEGIN '
+            f'UPDATE {FTS_TABLE} SET username = new.username '
+            f'WHERE rowid IN (SELECT id FROM {recipes} '
+            f'WHERE author_id = new.id); END'
+        )
+    _fts_available.pop(using, None)
@@ -1,23 +1,30 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
+from foodgram.instrumentation import TimedSerializerMixin
+from .bulk import MAX_RECIPES
 from .fields import Base64ImageField
+from .images import variant_url
 from .models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
     Favorite,
     ShoppingCart,
+    ShoppingListItem,
     COOKING_TIME_MIN,
     COOKING_TIME_MAX,
     AMOUNT_MIN,
     AMOUNT_MAX,
 )
+from .shopping_list import recipe_ingredients_changed
+from .viewer import viewer_context
 
 User = get_user_model()
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
 
@@ -30,29 +37,38 @@ class AuthorSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return request.user.subscriptions.filter(author=obj).exists()
+        return obj.pk in viewer_context(
+            self.context.get('request')
+        ).subscriptions
 
     def get_avatar(self, obj):
-        request = self.context.get('request')
         avatar = getattr(getattr(obj, 'profile', None), 'avatar', None)
-        if not avatar or not avatar.name:
-            return None
-        url = avatar.url
-        return request.build_absolute_uri(url) if request else url
+        return variant_url(avatar, 'avatar', self.context.get('request'))
 
 
-class RecipeSimpleSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(read_only=True)
+class ImageVariantField(serializers.ImageField):
+    """URL уменьшенной копии картинки (см. recipes.images)."""
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return variant_url(value, self.variant, self.context.get('request'))
+
+
+class RecipeSimpleSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
+    image = ImageVariantField('thumbnail')
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
@@ -71,12 +87,12 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
     ingredients = RecipeIngredientReadSerializer(
         source='recipeingredient_set', many=True, read_only=True
     )
-    image = serializers.ImageField(read_only=True)
+    image = ImageVariantField('full')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -85,26 +101,38 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'text', 'cooking_time',
+            'favorites_count', 'shopping_cart_count'
         )
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and obj.favorited_by.filter(user=user).exists()
-        )
+        return obj.pk in viewer_context(self.context.get('request')).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and obj.in_shopping_carts.filter(user=user).exists()
-        )
+        return obj.pk in viewer_context(self.context.get('request')).cart
+
+
+class IngredientIdField(serializers.PrimaryKeyRelatedField):
+    """
+    Проверяет только формат id. Сами ингредиенты всего рецепта ищутся
+    одним запросом в RecipeWriteSerializer.validate_ingredients().
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class RecipeListSerializer(RecipeReadSerializer):
+    image = ImageVariantField('card')
 
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = IngredientIdField(
         queryset=Ingredient.objects.all(), source='ingredient', write_only=True
     )
     amount = serializers.IntegerField(
@@ -129,6 +157,25 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             'ingredients', 'image', 'name', 'text', 'cooking_time'
         )
 
+    def validate_ingredients(self, ingredients):
+        found = Ingredient.objects.in_bulk(
+            {ing['ingredient'] for ing in ingredients}
+        )
+        id_field = self.fields['ingredients'].child.fields['id']
+        errors = []
+        for ing in ingredients:
+            ingredient = found.get(ing['ingredient'])
+            if ingredient is None:
+                errors.append({'id': [id_field.error_messages[
+                    'does_not_exist'
+                ].format(pk_value=ing['ingredient'])]})
+            else:
+                ing['ingredient'] = ingredient
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return ingredients
+
     def validate(self, data):
         ingredients = data.get('ingredients')
         if not ingredients:
@@ -157,14 +204,39 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
         return data
 
-    def _save_ingredients(self, recipe, ingredients):
+    def _save_ingredients(self, recipe, ingredients, current=()):
+        """
+        Приводит ингредиенты рецепта к ingredients за постоянное число
+        запросов: одна вставка, одно обновление и одно удаление пачкой.
+        """
+        current = {item.ingredient_id: item for item in current}
+        to_create = []
+        to_update = []
         for ing in ingredients:
-            RecipeIngredient.objects.create(
-                recipe=recipe,
-                ingredient=ing['ingredient'],
-                amount=ing['amount']
-            )
-
+            item = current.pop(ing['ingredient'].pk, None)
+            if item is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ing['ingredient'],
+                    amount=ing['amount']
+                ))
+            elif item.amount != ing['amount']:
+                item.amount = ing['amount']
+                to_update.append(item)
+        if current:
+            RecipeIngredient.objects.filter(
+                pk__in=[item.pk for item in current.values()]
+            ).delete()
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        recipe_ingredients_changed(recipe.pk, {
+            item.ingredient_id
+            for item in (*current.values(), *to_create, *to_update)
+        })
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         author = validated_data.pop('author', self.context['request'].user)
@@ -174,17 +246,43 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         self._save_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         if ingredients is not None:
-            instance.recipeingredient_set.all().delete()
-            self._save_ingredients(instance, ingredients)
+            self._save_ingredients(
+                instance, ingredients, instance.recipeingredient_set.all()
+            )
         instance.save()
         return instance
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пачечных операций (recipes.bulk)."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_RECIPES
+    )
+
+    def validate_recipes(self, recipe_ids):
+        return list(dict.fromkeys(recipe_ids))
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
@@ -0,0 +1,248 @@
+"""
+Список покупок: агрегат ингредиентов из корзины и его выгрузка в TXT/PDF.
+
+Агрегат хранится в ShoppingListItem и обновляется при записи: когда
+рецепт попадает в корзину или уходит из неё и когда меняются
+ингредиенты рецепта из корзины. Пересчитываются по корзине только
+строки затронутых ингредиентов у затронутых пользователей, так что
+агрегат не расходится при гонках.
+
+Готовые файлы кэшируются под версией корзины пользователя: версия
+меняется при изменении его ShoppingCart и ингредиентов рецептов из
+корзины (см. recipes.signals), а также вместе со справочником
+ингредиентов. Та же версия служит ETag. Пока версия свежее
+REPLICA_PIN_SECONDS, список читается с основной базы: иначе данные
+отставшей реплики попали бы в кэш под новой версией.
+"""
+import hashlib
+from tempfile import SpooledTemporaryFile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from reportlab.pdfgen import canvas
+
+from .conditional import content_changed, reads_for
+from .ingredient_index import VERSION_NAME as INGREDIENTS_VERSION
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+from .versions import bump_version, get_version, version_time
+
+# Сколько строк агрегата читать из базы за раз при потоковой выдаче.
+ITERATOR_CHUNK_SIZE = 500
+# PDF держится в памяти до этого размера, дальше — во временном файле.
+PDF_SPOOL_MAX_SIZE = 1024 * 1024
+# Файлы больше этого размера не кэшируются.
+CACHE_MAX_SIZE = 512 * 1024
+CACHE_TIMEOUT = 60 * 60 * 24
+
+FORMATS = {
+    'txt': ('text/plain', 'shopping_list.txt'),
+    'pdf': ('application/pdf', 'shopping_list.pdf'),
+}
+
+
+def cart_version_name(user_id):
+    return f'shopping_cart:{user_id}'
+
+
+def bump_cart_version(user_id):
+    bump_version(cart_version_name(user_id))
+
+
+def bump_cart_versions_for_recipes(recipe_ids):
+    """Сбрасывает версии всех, у кого эти рецепты лежат в корзине."""
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        bump_cart_version(user_id)
+
+
+@transaction.atomic
+def refresh_shopping_lists(user_ids, ingredient_ids=None):
+    """
+    Пересчитывает строки ShoppingListItem пользователей user_ids по их
+    корзинам: все или только по ингредиентам ingredient_ids.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    # Пересчёты одного пользователя идут по очереди: иначе два
+    # параллельных могли бы не увидеть корзину друг друга.
+    list(get_user_model().objects.select_for_update().filter(
+        pk__in=user_ids
+    ).order_by('pk').values_list('pk', flat=True))
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+    totals = RecipeIngredient.objects.filter(
+        recipe__in_shopping_carts__user_id__in=user_ids
+    )
+    if ingredient_ids is not None:
+        items = items.filter(ingredient_id__in=ingredient_ids)
+        totals = totals.filter(ingredient_id__in=ingredient_ids)
+    totals = totals.values_list(
+        'recipe__in_shopping_carts__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, amount=total
+        )
+        for user_id, ingredient_id, total in totals
+    )
+
+
+def recipe_ingredient_ids(recipe_ids):
+    return set(RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', flat=True))
+
+
+def recipes_added_to_cart(user_id, recipe_ids):
+    refresh_shopping_lists([user_id], recipe_ingredient_ids(recipe_ids))
+
+
+def recipes_removed_from_cart(user_id, ingredient_ids):
+    """
+    ingredient_ids собираются до удаления строк корзины: при каскадном
+    удалении рецепта его ингредиентов к этому моменту уже нет.
+    """
+    if ingredient_ids:
+        refresh_shopping_lists([user_id], ingredient_ids)
+
+
+def recipe_ingredients_changed(recipe_id, ingredient_ids):
+    """
+    Вызывается после записи ингредиентов рецепта (сериализатор, админка)
+    с id добавленных, изменённых и удалённых ингредиентов: у
+    пользователей с рецептом в корзине пересчитываются только они.
+    Пачечные операции не шлют сигналов, поэтому сигналов на
+    RecipeIngredient нет: кто меняет ингредиенты, тот и сообщает.
+    """
+    if not ingredient_ids:
+        return
+    content_changed()
+    refresh_shopping_lists(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        ),
+        ingredient_ids
+    )
+    transaction.on_commit(
+        lambda: bump_cart_versions_for_recipes([recipe_id])
+    )
+
+
+def shopping_list_items(user):
+    items = ShoppingListItem.objects.filter(user=user).values(
+        'ingredient_id', 'ingredient__name', 'ingredient__measurement_unit',
+        total_amount=F('amount')
+    ).order_by('ingredient__name')
+    # База выбирается сразу: текст читается потоком уже после выхода
+    # из вьюхи и из shopping_list_reads().
+    return items.using(items.db)
+
+
+def format_item(item):
+    return (
+        f"{item['ingredient__name']} "
+        f"({item['ingredient__measurement_unit']}) — "
+        f"{item['total_amount']}"
+    )
+
+
+def iter_lines(items):
+    for item in items.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield format_item(item)
+
+
+def iter_text(items):
+    """Строки списка через перевод строки, по одной за раз."""
+    separator = ''
+    for line in iter_lines(items):
+        yield f'{separator}{line}'.encode('utf-8')
+        separator = '\n'
+
+
+def render_pdf(items):
+    """
+    Рисует PDF построчно в SpooledTemporaryFile и возвращает файл,
+    перемотанный в начало. Потоки страниц сжимаются, а готовый документ
+    уходит на диск, если он больше PDF_SPOOL_MAX_SIZE.
+    """
+    buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    pdf = canvas.Canvas(buffer, pageCompression=1)
+    y = 800
+    for line in iter_lines(items):
+        pdf.drawString(50, y, line)
+        y -= 15
+        if y < 50:
+            pdf.showPage()
+            y = 800
+    pdf.save()
+    buffer.seek(0)
+    return buffer
+
+
+def shopping_list_versions(user):
+    return (
+        get_version(cart_version_name(user.pk)),
+        get_version(INGREDIENTS_VERSION),
+    )
+
+
+def shopping_list_cache_key(user, fmt, versions):
+    return 'shopping_list:{}:{}:{}:{}'.format(user.pk, fmt, *versions)
+
+
+def shopping_list_reads(versions):
+    """Чтение с основной базы, пока реплики могли не догнать версии."""
+    return reads_for(max(map(version_time, versions)))
+
+
+def shopping_list_etag(cache_key):
+    return '"{}"'.format(hashlib.md5(cache_key.encode()).hexdigest())
+
+
+def _caching_iterator(chunks, cache_key):
+    """Отдаёт куски дальше и кладёт весь файл в кэш, если он небольшой."""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size <= CACHE_MAX_SIZE:
+                parts.append(chunk)
+            else:
+                parts = None
+        yield chunk
+    if parts is not None:
+        cache.set(cache_key, b''.join(parts), CACHE_TIMEOUT)
+
+
+def shopping_list_response(user, fmt, cache_key):
+    content_type, filename = FORMATS[fmt]
+    content = cache.get(cache_key)
+    if content is not None:
+        response = HttpResponse(content, content_type=content_type)
+    elif fmt == 'pdf':
+        buffer = render_pdf(shopping_list_items(user))
+        if buffer.seek(0, 2) <= CACHE_MAX_SIZE:
+            buffer.seek(0)
+            content = buffer.read()
+            buffer.close()
+            cache.set(cache_key, content, CACHE_TIMEOUT)
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            buffer.seek(0)
+            response = FileResponse(buffer, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            _caching_iterator(
+                iter_text(shopping_list_items(user)), cache_key
+            ),
+            content_type=content_type
+        )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
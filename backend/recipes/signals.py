@@ -0,0 +1,155 @@
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import Profile, Subscription
+
+from . import bulk, feed
+from .images import AVATAR_VARIANTS, RECIPE_VARIANTS, make_variants
+from .conditional import content_changed, counters_changed, viewer_changed
+from .counters import change_counter
+from .ingredient_index import ingredient_index
+from .models import Favorite, Ingredient, Recipe, ShoppingCart
+from .shopping_list import (
+    bump_cart_version,
+    recipe_ingredient_ids,
+    recipes_added_to_cart,
+    recipes_removed_from_cart
+)
+
+
+def unless_bulk(handler):
+    """Пачечные операции (recipes.bulk) делают эту работу сами."""
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not bulk.managed():
+            return handler(*args, **kwargs)
+    return wrapper
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@unless_bulk
+def invalidate_shopping_list(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_cart_version(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_recipe_responses(sender, **kwargs):
+    content_changed()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_author_responses(sender, update_fields=None, **kwargs):
+    # Вход в систему обновляет только last_login — его в ответах нет.
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        content_changed()
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Subscription)
+@unless_bulk
+def invalidate_viewer_responses(sender, instance, **kwargs):
+    viewer_changed(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def make_recipe_image_variants(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: make_variants(instance.image, RECIPE_VARIANTS)
+    )
+
+
+@receiver(post_save, sender=Profile)
+def make_avatar_variants(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: make_variants(instance.avatar, AVATAR_VARIANTS)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def prune_feed(sender, instance, **kwargs):
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@unless_bulk
+def count_favorites(sender, instance, created=False, **kwargs):
+    if kwargs['signal'] is post_save and not created:
+        return
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        'favorites_count', 1 if created else -1
+    )
+    counters_changed()
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@unless_bulk
+def count_shopping_carts(sender, instance, created=False, **kwargs):
+    if kwargs['signal'] is post_save and not created:
+        return
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        'shopping_cart_count', 1 if created else -1
+    )
+    counters_changed()
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def count_author_recipes(sender, instance, created=False, **kwargs):
+    if kwargs['signal'] is post_save and not created:
+        return
+    changed = change_counter(
+        Profile.objects.filter(user_id=instance.author_id),
+        'recipes_count', 1 if created else -1
+    )
+    if created and not changed:
+        # У автора нет профиля: создаём его сразу с точным числом.
+        Profile.objects.get_or_create(
+            user_id=instance.author_id,
+            defaults={'recipes_count': Recipe.objects.filter(
+                author_id=instance.author_id
+            ).count()}
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+@unless_bulk
+def remember_cart_ingredients(sender, instance, **kwargs):
+    # Каскадом ингредиенты рецепта удаляются раньше строки корзины.
+    instance._shopping_list_ingredients = recipe_ingredient_ids(
+        [instance.recipe_id]
+    )
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@unless_bulk
+def update_shopping_list(sender, instance, created=False, **kwargs):
+    if kwargs['signal'] is post_delete:
+        recipes_removed_from_cart(
+            instance.user_id, instance._shopping_list_ingredients
+        )
+    elif created:
+        recipes_added_to_cart(instance.user_id, [instance.recipe_id])
@@ -0,0 +1,79 @@
+"""
+Хранилище картинок с адресацией по содержимому.
+
+Имя файла — sha256 его байтов, поэтому одинаковые картинки (например,
+повторная отправка той же фотографии при редактировании рецепта)
+хранятся один раз. Ссылки на файл — это строки Recipe.image и
+Profile.avatar; файлы без ссылок удаляет команда collect_media_garbage.
+"""
+import hashlib
+import os
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+# Поля, чьи файлы лежат в этом хранилище.
+MEDIA_FIELDS = (
+    ('recipes.Recipe', 'image'),
+    ('users.Profile', 'avatar'),
+)
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Сохраняет файл как <каталог>/<ab>/<sha256>.<расширение>.
+
+    Если такой файл уже есть, запись пропускается, а у файла обновляется
+    время изменения, чтобы сборщик мусора не удалил его в льготный период.
+    delete() ничего не делает: файл может быть общим для нескольких
+    записей, удалять его можно только через purge().
+    """
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        name = os.path.join(directory, digest[:2], digest + ext)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+    def delete(self, name):
+        pass
+
+    def purge(self, name):
+        super().delete(name)
+
+
+media_storage = ContentAddressedStorage()
+
+
+def reference_counts():
+    """Число ссылок из БД на каждый файл хранилища."""
+    counts = Counter()
+    for model_name, field_name in MEDIA_FIELDS:
+        model = apps.get_model(model_name)
+        counts.update(
+            model.objects.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True}
+            ).values_list(field_name, flat=True).iterator()
+        )
+    return counts
+
+
+def upload_directories():
+    return sorted({
+        apps.get_model(model_name)._meta.get_field(field_name).upload_to
+        for model_name, field_name in MEDIA_FIELDS
+    })
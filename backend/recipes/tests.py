@@ -0,0 +1,726 @@
+import base64
+import io
+import os
+import tempfile
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Sum
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from foodgram.replicas import _read_database
+from users.models import Subscription
+
+from .fields import Base64ImageField
+from .images import RECIPE_VARIANTS, variant_name, variant_url
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem
+)
+from .storage import media_storage
+from .shopping_list import recipe_ingredients_changed
+
+User = get_user_model()
+
+MB = 1024 * 1024
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def base64_image(payload, line_length=None):
+    encoded = base64.b64encode(payload).decode()
+    if line_length:
+        encoded = '\n'.join(
+            encoded[position:position + line_length]
+            for position in range(0, len(encoded), line_length)
+        )
+    return f'data:image/png;base64,{encoded}'
+
+
+class Base64ImageFieldTest(SimpleTestCase):
+    """Декодирование base64-картинок: размер и пиковая память."""
+
+    def decode_traced(self, data):
+        """Результат _decode и пик выделенной при этом памяти."""
+        field = Base64ImageField()
+        tracemalloc.start()
+        try:
+            try:
+                result = field._decode(data)
+            except ValidationError as error:
+                result = error
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, peak
+
+    def test_large_payload_decoded_in_chunks(self):
+        payload = os.urandom(8 * MB)
+        upload, peak = self.decode_traced(base64_image(payload, 76))
+        self.addCleanup(upload.close)
+        self.assertEqual(upload.size, len(payload))
+        self.assertEqual(upload.read(), payload)
+        # Прежняя реализация держала в памяти несколько копий строки
+        # и весь результат — больше 30 МБ на таком payload.
+        self.assertLess(peak, 1 * MB)
+
+    @override_settings(MAX_IMAGE_UPLOAD_SIZE=1 * MB)
+    def test_oversize_rejected_before_decoding(self):
+        data = base64_image(os.urandom(4 * MB))
+        with mock.patch('recipes.fields.base64.b64decode') as b64decode:
+            error, peak = self.decode_traced(data)
+        self.assertIsInstance(error, ValidationError)
+        self.assertEqual(error.detail[0].code, 'too_large')
+        b64decode.assert_not_called()
+        self.assertLess(peak, 64 * 1024)
+
+    def test_invalid_base64(self):
+        error, _ = self.decode_traced('data:image/png;base64,abc$')
+        self.assertIsInstance(error, ValidationError)
+        self.assertEqual(error.detail[0].code, 'invalid_base64')
+
+    def test_image_validated(self):
+        payload = png_bytes()
+        image = Base64ImageField().to_internal_value(base64_image(payload))
+        self.assertTrue(image.name.endswith('.png'))
+        self.assertEqual(image.size, len(payload))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageVariantTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+
+    def create_recipe(self, content):
+        recipe = Recipe(
+            author=self.author, name='Блины', text='Текст', cooking_time=20
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image.save('pancakes.png', ContentFile(content))
+        return recipe
+
+    def variant_path(self, recipe, variant):
+        return '/media/' + variant_name(recipe.image.name, variant)
+
+    def test_variants_made_on_upload(self):
+        recipe = self.create_recipe(png_bytes())
+        for variant in RECIPE_VARIANTS:
+            self.assertTrue(default_storage.exists(
+                variant_name(recipe.image.name, variant)
+            ))
+
+    def test_url_without_storage_access(self):
+        recipe = self.create_recipe(png_bytes())
+        with mock.patch.object(default_storage, 'exists') as exists:
+            url = variant_url(recipe.image, 'card')
+        exists.assert_not_called()
+        self.assertEqual(url, self.variant_path(recipe, 'card'))
+
+    def test_missing_variant_made_on_request(self):
+        recipe = self.create_recipe(png_bytes())
+        default_storage.delete(variant_name(recipe.image.name, 'card'))
+        response = self.client.get(self.variant_path(recipe, 'card'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        response.close()
+        self.assertTrue(default_storage.exists(
+            variant_name(recipe.image.name, 'card')
+        ))
+
+    def test_unreadable_original_not_retried(self):
+        with mock.patch(
+            'recipes.images._render_variant', side_effect=OSError
+        ) as render:
+            recipe = self.create_recipe(b'not an image')
+            self.assertEqual(render.call_count, 1)
+            for _ in range(2):
+                response = self.client.get(self.variant_path(recipe, 'card'))
+                self.assertRedirects(
+                    response, media_storage.url(recipe.image.name),
+                    fetch_redirect_response=False
+                )
+        self.assertEqual(render.call_count, 1)
+
+    def test_unknown_paths(self):
+        for path in (
+            '/media/derivatives/huge/recipes/images/x.webp',
+            '/media/derivatives/card/recipes/images/missing.webp',
+            '/media/derivatives/card/recipes/../../settings.webp',
+            '/media/derivatives/card/other/x.webp',
+        ):
+            self.assertEqual(self.client.get(path).status_code, 404, path)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ConditionalResponseTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        self.recipe = Recipe(
+            author=author, name='Блины', text='Текст', cooking_time=20
+        )
+        self.recipe.image.save('pancakes.png', ContentFile(png_bytes()))
+
+    @override_settings(COUNTERS_STALE_SECONDS=60)
+    def test_counters_settle_without_content_version(self):
+        viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='password'
+        )
+        client = APIClient()
+        client.force_authenticate(viewer)
+        url = f'/api/recipes/{self.recipe.pk}/'
+        start = 60 * 30_000_000
+        with mock.patch('time.time', return_value=start + 10):
+            first = APIClient().get(url)
+        with mock.patch('time.time', return_value=start + 20), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post(url + 'favorite/')
+        self.assertEqual(response.status_code, 201)
+        with mock.patch('time.time', return_value=start + 30):
+            cached = APIClient().get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        with mock.patch('time.time', return_value=start + 70):
+            settled = APIClient().get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(settled.status_code, 200)
+        self.assertEqual(settled.json()['favorites_count'], 1)
+
+    def test_host_and_scheme_in_etag(self):
+        client = APIClient()
+        local = client.get('/api/recipes/', HTTP_HOST='localhost')
+        loopback = client.get(
+            '/api/recipes/', HTTP_HOST='127.0.0.1',
+            HTTP_IF_NONE_MATCH=local['ETag']
+        )
+        secure = client.get(
+            '/api/recipes/', HTTP_HOST='localhost', secure=True
+        )
+        self.assertEqual(loopback.status_code, 200)
+        self.assertEqual(len({
+            response['ETag'] for response in (local, loopback, secure)
+        }), 3)
+        for response, prefix in (
+            (local, 'http://localhost/'),
+            (loopback, 'http://127.0.0.1/'),
+            (secure, 'https://localhost/'),
+        ):
+            self.assertTrue(
+                response.json()['results'][0]['image'].startswith(prefix)
+            )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeAPITestCase(TestCase):
+    """Автор, зритель и ингредиенты; рецепты создаются без API."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password', first_name='А', last_name='А'
+        )
+        self.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com',
+            password='password', first_name='З', last_name='З'
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Молоко', 'Сахар', 'Яйца')
+        ]
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+        self.viewer_client = APIClient()
+        self.viewer_client.force_authenticate(self.viewer)
+
+    def create_recipe(self, name='Блины', amounts=None):
+        """amounts — {ингредиент: количество}."""
+        if amounts is None:
+            amounts = {self.ingredients[0]: 100, self.ingredients[1]: 200}
+        recipe = Recipe(
+            author=self.author, name=name, text='Текст', cooking_time=20
+        )
+        recipe.image.save('recipe.png', ContentFile(png_bytes()))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def update_ingredients(self, recipe, amounts):
+        """PATCH рецепта от автора с новыми ингредиентами."""
+        return self.author_client.patch(
+            f'/api/recipes/{recipe.pk}/',
+            {
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'image': base64_image(png_bytes()),
+                'ingredients': [
+                    {'id': ingredient.pk, 'amount': amount}
+                    for ingredient, amount in amounts.items()
+                ],
+            },
+            format='json'
+        )
+
+
+class RecipeCollectionTest(RecipeAPITestCase):
+    """Избранное и корзина: по одному рецепту и пачкой."""
+
+    def test_single_add_twice(self):
+        recipe = self.create_recipe()
+        for model, path, error in (
+            (Favorite, 'favorite', 'Рецепт уже в избранном!'),
+            (ShoppingCart, 'shopping_cart', 'Рецепт уже в корзине!'),
+        ):
+            url = f'/api/recipes/{recipe.pk}/{path}/'
+            self.assertEqual(self.viewer_client.post(url).status_code, 201)
+            # Повтор отсекает ограничение уникальности, а не проверка.
+            with mock.patch.object(
+                model.objects, 'filter', side_effect=AssertionError
+            ):
+                response = self.viewer_client.post(url)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'errors': error})
+            self.assertEqual(model.objects.filter(recipe=recipe).count(), 1)
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.shopping_cart_count), (1, 1)
+        )
+
+    def test_single_remove_missing(self):
+        recipe = self.create_recipe()
+        url = f'/api/recipes/{recipe.pk}/favorite/'
+        self.viewer_client.post(url)
+        self.assertEqual(self.viewer_client.delete(url).status_code, 204)
+        response = self.viewer_client.delete(url)
+        self.assertEqual(response.status_code, 400)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_bulk_add_skips_duplicates(self):
+        ids = [
+            self.create_recipe(f'Рецепт {number}').pk for number in range(3)
+        ]
+        self.viewer_client.post(f'/api/recipes/{ids[0]}/shopping_cart/')
+        response = self.viewer_client.post(
+            '/api/recipes/shopping_cart/', {'recipes': [*ids, ids[1]]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([recipe['id'] for recipe in response.json()], ids)
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.viewer).count(), 3
+        )
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=ids).values_list(
+                'shopping_cart_count', flat=True
+            )), [1, 1, 1]
+        )
+
+    def test_bulk_add_missing_recipe(self):
+        recipe = self.create_recipe()
+        response = self.viewer_client.post(
+            '/api/recipes/favorite/', {'recipes': [recipe.pk, 999_999]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', response.json()['recipes'][0])
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_bulk_remove(self):
+        ids = [
+            self.create_recipe(f'Рецепт {number}').pk for number in range(3)
+        ]
+        self.viewer_client.post(
+            '/api/recipes/favorite/', {'recipes': ids}, format='json'
+        )
+        response = self.viewer_client.delete(
+            '/api/recipes/favorite/', {'recipes': ids[:2]}, format='json'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            list(Favorite.objects.values_list('recipe_id', flat=True)),
+            ids[2:]
+        )
+        self.assertEqual(
+            dict(Recipe.objects.values_list('pk', 'favorites_count')),
+            {ids[0]: 0, ids[1]: 0, ids[2]: 1}
+        )
+        response = self.viewer_client.delete(
+            '/api/recipes/favorite/', {'recipes': ids[:2]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeReadQueriesTest(RecipeAPITestCase):
+    """Число запросов списка и карточки не зависит от числа рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        recipes = [
+            self.create_recipe(f'Рецепт {number}') for number in range(6)
+        ]
+        self.recipe = recipes[0]
+        self.viewer_client.post(
+            '/api/recipes/favorite/',
+            {'recipes': [recipe.pk for recipe in recipes[::2]]},
+            format='json'
+        )
+        cache.clear()
+
+    def test_list(self):
+        # COUNT, рецепты, авторы, ингредиенты.
+        with self.assertNumQueries(4):
+            response = APIClient().get('/api/recipes/')
+        self.assertEqual(len(response.json()['results']), 6)
+        # Повтор отдаётся из кэша.
+        with self.assertNumQueries(0):
+            APIClient().get('/api/recipes/')
+        # Плюс избранное, корзина и подписки зрителя.
+        with self.assertNumQueries(7):
+            response = self.viewer_client.get('/api/recipes/')
+        self.assertEqual(
+            [recipe['is_favorited'] for recipe in response.json()['results']],
+            [False, True] * 3
+        )
+
+    def test_detail(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        with self.assertNumQueries(3):
+            APIClient().get(url)
+        with self.assertNumQueries(6):
+            response = self.viewer_client.get(url)
+        self.assertTrue(response.json()['is_favorited'])
+
+
+class RecipeIngredientWriteTest(RecipeAPITestCase):
+    """Ингредиенты рецепта пишутся разницей за постоянное число запросов."""
+
+    def setUp(self):
+        super().setUp()
+        self.ingredients += [
+            Ingredient.objects.create(name=f'Специя {number}',
+                                      measurement_unit='г')
+            for number in range(8)
+        ]
+
+    def update_queries(self, recipe, amounts):
+        """Запросы PATCH и записи в RecipeIngredient среди них."""
+        cache.clear()
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+            response = self.update_ingredients(recipe, amounts)
+        self.assertEqual(response.status_code, 200)
+        table = RecipeIngredient._meta.db_table
+        writes = [
+            query['sql'].split()[0] for query in queries
+            if table in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        return len(queries), writes
+
+    def test_unchanged_ingredients_not_written(self):
+        recipe = self.create_recipe()
+        _, writes = self.update_queries(recipe, {
+            item.ingredient: item.amount
+            for item in recipe.recipeingredient_set.all()
+        })
+        self.assertEqual(writes, [])
+
+    def test_query_count_independent_of_size(self):
+        counts = []
+        for size in (2, 10):
+            amounts = dict.fromkeys(self.ingredients[:size], 10)
+            recipe = self.create_recipe(f'Рецепт {size}', amounts)
+            # Одно количество меняется, один ингредиент убирается,
+            # один добавляется, остальные не трогаются.
+            changed = dict.fromkeys(self.ingredients[1:size - 1], 10)
+            changed[self.ingredients[0]] = 20
+            changed[self.ingredients[-1]] = 5
+            count, writes = self.update_queries(recipe, changed)
+            self.assertEqual(writes, ['DELETE', 'INSERT', 'UPDATE'])
+            self.assertEqual(
+                dict(recipe.recipeingredient_set.values_list(
+                    'ingredient', 'amount'
+                )),
+                {ingredient.pk: amount
+                 for ingredient, amount in changed.items()}
+            )
+            counts.append(count)
+        self.assertEqual(counts[0], counts[1])
+
+
+class ShoppingListItemTest(RecipeAPITestCase):
+    """ShoppingListItem совпадает с суммой по корзине после любой записи."""
+
+    def assertMatchesCart(self):
+        expected = dict(RecipeIngredient.objects.filter(
+            recipe__in_shopping_carts__user=self.viewer
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total'))
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(
+                user=self.viewer
+            ).values_list('ingredient_id', 'amount')),
+            expected
+        )
+        return expected
+
+    def test_cart_changes(self):
+        flour, milk, sugar, eggs = self.ingredients
+        pancakes = self.create_recipe()
+        cake = self.create_recipe('Торт', {flour: 300, sugar: 150})
+        omelette = self.create_recipe('Омлет', {milk: 50, eggs: 3})
+        url = '/api/recipes/shopping_cart/'
+        self.viewer_client.post(f'/api/recipes/{pancakes.pk}/shopping_cart/')
+        self.assertMatchesCart()
+        self.viewer_client.post(
+            url, {'recipes': [cake.pk, omelette.pk]}, format='json'
+        )
+        self.assertEqual(
+            self.assertMatchesCart(),
+            {flour.pk: 400, milk.pk: 250, sugar.pk: 150, eggs.pk: 3}
+        )
+        self.viewer_client.delete(f'/api/recipes/{cake.pk}/shopping_cart/')
+        self.assertMatchesCart()
+        self.viewer_client.delete(
+            url, {'recipes': [omelette.pk]}, format='json'
+        )
+        self.assertEqual(
+            self.assertMatchesCart(), {flour.pk: 100, milk.pk: 200}
+        )
+
+    def test_recipe_edit_and_delete(self):
+        flour, milk, sugar, eggs = self.ingredients
+        pancakes = self.create_recipe()
+        cake = self.create_recipe('Торт', {flour: 300, sugar: 150})
+        self.viewer_client.post(
+            '/api/recipes/shopping_cart/',
+            {'recipes': [pancakes.pk, cake.pk]}, format='json'
+        )
+        response = self.update_ingredients(pancakes, {flour: 150, eggs: 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.assertMatchesCart(),
+            {flour.pk: 450, sugar.pk: 150, eggs.pk: 2}
+        )
+        response = self.author_client.delete(f'/api/recipes/{cake.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.assertMatchesCart(), {flour.pk: 150, eggs.pk: 2}
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FeedTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        self.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='password'
+        )
+        Subscription.objects.create(user=self.viewer, author=author)
+        self.recipe_ids = []
+        for number in range(3):
+            recipe = Recipe(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10
+            )
+            recipe.image.save('recipe.png', ContentFile(png_bytes()))
+            self.recipe_ids.append(recipe.pk)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def feed_ids(self, **params):
+        ids, url = [], '/api/recipes/feed/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids += [recipe['id'] for recipe in data['results']]
+            url, params = data['next'], None
+        return ids
+
+    def test_newest_first(self):
+        self.assertEqual(
+            self.feed_ids(limit=2), sorted(self.recipe_ids, reverse=True)
+        )
+
+    def test_recipe_ordering_ignored(self):
+        expected = sorted(self.recipe_ids, reverse=True)
+        for ordering in ('-favorites_count', 'id'):
+            self.assertEqual(
+                self.feed_ids(limit=2, ordering=ordering), expected, ordering
+            )
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Реплики не настроены (DB_REPLICAS)')
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ReplicaReadTest(TransactionTestCase):
+    """
+    Чтение с реплик на двух базах SQLite:
+
+        DB_ENGINE=django.db.backends.sqlite3 DB_NAME=db.sqlite3 \\
+        DB_REPLICAS=replica.sqlite3 \\
+        python manage.py test recipes.tests.ReplicaReadTest
+
+    В тестах реплика — зеркало default (TEST MIRROR), поэтому
+    проверяется, на какую базу уходят запросы.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password', first_name='А', last_name='А'
+        )
+        self.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com',
+            password='password', first_name='З', last_name='З'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        self.recipe = Recipe(
+            author=self.author, name='Блины', text='Текст', cooking_time=20
+        )
+        self.recipe.image.save('pancakes.png', ContentFile(png_bytes()))
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=100
+        )
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    @contextmanager
+    def queries(self):
+        """Число запросов по базам: 'default' и 'replica'."""
+        counts = Counter()
+
+        def counter(name):
+            def count(execute, sql, params, many, context):
+                counts[name] += 1
+                return execute(sql, params, many, context)
+            return count
+
+        with ExitStack() as stack:
+            for alias in connections:
+                name = 'default' if alias == DEFAULT_DB_ALIAS else 'replica'
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter(name))
+                )
+            yield counts
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_safe_reads_use_replica(self):
+        with self.queries() as queries:
+            response = APIClient().get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(queries['replica'], 0)
+        self.assertEqual(queries['default'], 0)
+
+    def test_writer_reads_from_primary(self):
+        viewer = self.client_for(self.viewer)
+        response = viewer.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        with self.queries() as queries:
+            response = viewer.get(f'/api/users/{self.author.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries['replica'], 0)
+        # Закрепляется только тот, кто писал.
+        with self.queries() as queries:
+            response = self.client_for(self.author).get(
+                f'/api/users/{self.viewer.pk}/'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(queries['replica'], 0)
+
+    def test_replica_choice_reset_after_error(self):
+        with mock.patch(
+            'recipes.views.IngredientViewSet.retrieve',
+            side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            APIClient().get(f'/api/ingredients/{self.ingredient.pk}/')
+        self.assertIsNone(_read_database.get())
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_ingredient_index_rebuilt_from_primary(self):
+        Ingredient.objects.create(name='Мёд', measurement_unit='г')
+        with self.queries() as queries:
+            response = APIClient().get('/api/ingredients/', {'name': 'мё'})
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.json()], ['Мёд']
+        )
+        self.assertGreater(queries['default'], 0)
+        self.assertEqual(queries['replica'], 0)
+
+    def test_shopping_list_reads_primary_after_recipe_change(self):
+        viewer = self.client_for(self.viewer)
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            response = viewer.post(
+                f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 201)
+        # Рецепт меняет автор: пользователь с корзиной не закреплён.
+        with transaction.atomic():
+            RecipeIngredient.objects.filter(recipe=self.recipe).update(
+                amount=250
+            )
+            recipe_ingredients_changed(self.recipe.pk, {self.ingredient.pk})
+        with self.queries() as queries:
+            items = viewer.get('/api/recipes/shopping_list/').json()
+            text = b''.join(viewer.get(
+                '/api/recipes/download_shopping_cart/'
+            ).streaming_content).decode()
+            pdf = viewer.get(
+                '/api/recipes/download_shopping_cart/', {'format': 'pdf'}
+            )
+        self.assertEqual([item['amount'] for item in items], [250])
+        self.assertEqual(text, 'Мука (г) — 250')
+        self.assertEqual(pdf.status_code, 200)
+        self.assertEqual(queries['replica'], 0)
+        with override_settings(REPLICA_PIN_SECONDS=0), \
+                self.queries() as queries:
+            viewer.get('/api/recipes/shopping_list/')
+        self.assertGreater(queries['replica'], 0)
@@ -0,0 +1,48 @@
+"""
+Версии данных для инвалидации кэшей.
+
+Версия — случайный токен в общем кэше (settings.CACHES): смена версии
+сразу видна всем процессам, а старые записи, построенные по прежней
+версии, просто перестают читаться и вытесняются кэшем сами.
+Токен начинается с времени смены версии — оно идёт в Last-Modified.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'version:'
+
+
+def _new_version():
+    return f'{time.time():.6f}-{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """Время смены версии, секунды с начала эпохи."""
+    return float(version.split('-', 1)[0])
+
+
+def get_version(name):
+    key = KEY_PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    cache.set(KEY_PREFIX + name, _new_version(), None)
+
+
+async def aget_versions(names):
+    keys = [KEY_PREFIX + name for name in names]
+    found = await cache.aget_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, _new_version(), None)
+            found[key] = await cache.aget(key)
+        versions.append(found[key])
+    return versions
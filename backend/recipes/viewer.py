@@ -0,0 +1,96 @@
+"""
+Связи зрителя: id рецептов в его избранном и корзине, id авторов из
+его подписок. Сериализаторы отвечают на is_favorited,
+is_in_shopping_cart и is_subscribed по этим множествам.
+
+Множества загружаются не чаще раза за запрос и кэшируются между
+запросами под версией зрителя (recipes.conditional.viewer_changed):
+запись в избранное, корзину или подписки её меняет.
+"""
+from django.core.cache import cache
+
+from users.models import Subscription
+
+from .conditional import reads_for, viewer_version_name
+from .models import Favorite, ShoppingCart
+from .versions import aget_versions, get_version, version_time
+
+CACHE_PREFIX = 'viewer:context:'
+CACHE_TIMEOUT = 60 * 60
+
+
+class ViewerContext:
+    def __init__(self, favorites=(), cart=(), subscriptions=()):
+        self.favorites = frozenset(favorites)
+        self.cart = frozenset(cart)
+        self.subscriptions = frozenset(subscriptions)
+
+
+ANONYMOUS = ViewerContext()
+
+
+def _querysets(user):
+    return (
+        Favorite.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        ),
+        ShoppingCart.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        ),
+        Subscription.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ),
+    )
+
+
+def _cache_key(user, version):
+    return f'{CACHE_PREFIX}{user.pk}:{version}'
+
+
+def load_viewer_context(user):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    version = get_version(viewer_version_name(user.pk))
+    key = _cache_key(user, version)
+    context = cache.get(key)
+    if context is None:
+        # Свежую версию реплика может ещё не догнать.
+        with reads_for(version_time(version)):
+            context = ViewerContext(*(
+                list(queryset) for queryset in _querysets(user)
+            ))
+        cache.set(key, context, CACHE_TIMEOUT)
+    return context
+
+
+async def aload_viewer_context(user):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    [version] = await aget_versions([viewer_version_name(user.pk)])
+    key = _cache_key(user, version)
+    context = await cache.aget(key)
+    if context is None:
+        with reads_for(version_time(version)):
+            context = ViewerContext(*[
+                [pk async for pk in queryset]
+                for queryset in _querysets(user)
+            ])
+        await cache.aset(key, context, CACHE_TIMEOUT)
+    return context
+
+
+def viewer_context(request):
+    """Связи пользователя запроса; без запроса — как у анонима."""
+    if request is None:
+        return ANONYMOUS
+    context = getattr(request, '_viewer_context', None)
+    if context is None:
+        context = load_viewer_context(request.user)
+        request._viewer_context = context
+    return context
+
+
+async def aprepare_viewer_context(request):
+    """Для async-вьюх: загрузить связи до синхронной сериализации."""
+    if getattr(request, '_viewer_context', None) is None:
+        request._viewer_context = await aload_viewer_context(request.user)
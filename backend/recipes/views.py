@@ -1,35 +1,54 @@
-from io import BytesIO
-
 import django_filters
-from django.db.models import Sum
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from rest_framework import filters, status, viewsets
+from django.db import IntegrityError, transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (
     IsAuthenticated,
     IsAuthenticatedOrReadOnly
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.pagination import LimitOffsetPagination
 
-from .filters import RecipeFilter
+from foodgram.replicas import ReplicaReadMixin
+
+from .bulk import add_recipes, remove_recipes
+from .conditional import conditional_response
+from .filters import (
+    RecipeFilter,
+    RecipeOrderingFilter,
+    RecipeSearchFilter
+)
+from .ingredient_index import ingredient_index
 from .models import (
+    FeedEntry,
     Ingredient,
     Recipe,
     Favorite,
     ShoppingCart,
-    RecipeIngredient
+    ShoppingListItem,
 )
+from .pagination import FeedCursorPagination, RecipePagination
+from .renderers import PDFRenderer, PlainTextRenderer
 from .serializers import (
     IngredientSerializer,
+    RecipeIdsSerializer,
+    RecipeListSerializer,
     RecipeReadSerializer,
     RecipeWriteSerializer,
     RecipeSimpleSerializer,
     FavoriteSerializer,
-    ShoppingCartSerializer
+    ShoppingCartSerializer,
+    ShoppingListItemSerializer
+)
+from .shopping_list import (
+    shopping_list_cache_key,
+    shopping_list_etag,
+    shopping_list_reads,
+    shopping_list_response,
+    shopping_list_versions
 )
 
 
@@ -43,27 +62,40 @@ class IngredientFilter(django_filters.FilterSet):
         fields = ['name']
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_class = IngredientFilter
 
+    def filter_queryset(self, queryset):
+        # Список и автодополнение отдаются из индекса в памяти.
+        if self.action != 'list':
+            return super().filter_queryset(queryset)
+        name = self.request.query_params.get('name')
+        if name:
+            return ingredient_index.search(name)
+        return ingredient_index.all()
+
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = LimitOffsetPagination
+    pagination_class = RecipePagination
     filter_backends = [
         django_filters.rest_framework.DjangoFilterBackend,
-        filters.SearchFilter
+        RecipeSearchFilter,
+        RecipeOrderingFilter
     ]
     filterset_class = RecipeFilter
     search_fields = ['name', 'author__username']
+    ordering_fields = ['favorites_count', 'shopping_cart_count', 'id']
 
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_read_data()
         if user.is_authenticated:
             fav = self.request.query_params.get('is_favorited')
             if fav in ('true', 'True', '1'):
@@ -74,24 +106,44 @@ class RecipeViewSet(ModelViewSet):
         return queryset
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action == 'list':
+            return RecipeListSerializer
+        if self.action == 'retrieve':
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request, lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request, lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def _read_data(self, recipe):
+        recipe = Recipe.objects.with_read_data().get(pk=recipe.pk)
+        return RecipeReadSerializer(
+            recipe, context=self.get_serializer_context()
+        ).data
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
-        output = RecipeReadSerializer(
-            serializer.instance, context={'request': request}
-        )
+        data = self._read_data(serializer.instance)
         return Response(
-            output.data,
+            data,
             status=status.HTTP_201_CREATED,
-            headers=self.get_success_headers(output.data)
+            headers=self.get_success_headers(data)
         )
 
     def update(self, request, *args, **kwargs):
@@ -104,10 +156,7 @@ class RecipeViewSet(ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        output = RecipeReadSerializer(
-            serializer.instance, context={'request': request}
-        )
-        return Response(output.data)
+        return Response(self._read_data(serializer.instance))
 
     def destroy(self, request, *args, **kwargs):
         recipe = self.get_object()
@@ -116,69 +165,140 @@ class RecipeViewSet(ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
     @action(
-        detail=True,
-        methods=['post'],
+        detail=False,
+        methods=['get'],
         permission_classes=[IsAuthenticated]
     )
-    def favorite(self, request, pk=None):
+    def feed(self, request):
+        """
+        GET /api/recipes/feed/ — рецепты авторов из подписок, новые
+        первыми; курсорная пагинация (?cursor=, ?limit=).
+        """
+        paginator = FeedCursorPagination()
+        entries = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).only('recipe_id'),
+            request
+        )
+        recipes = Recipe.objects.with_read_data().in_bulk(
+            [entry.recipe_id for entry in entries]
+        )
+        serializer = RecipeListSerializer(
+            [recipes[entry.recipe_id] for entry in entries
+             if entry.recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    def _add_recipe(self, model, error):
+        """
+        Одна вставка: повторное добавление отсекает ограничение
+        уникальности (user, recipe), а не предварительная проверка.
+        """
         recipe = self.get_object()
-        if recipe.favorited_by.filter(user=request.user).exists():
+        try:
+            with transaction.atomic():
+                model.objects.create(user=self.request.user, recipe=recipe)
+        except IntegrityError:
             return Response(
-                {'errors': 'Рецепт уже в избранном!'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'errors': error}, status=status.HTTP_400_BAD_REQUEST
             )
-        recipe.favorited_by.create(user=request.user)
         data = RecipeSimpleSerializer(
-            recipe, context={'request': request}
+            recipe, context={'request': self.request}
         ).data
         return Response(data, status=status.HTTP_201_CREATED)
 
-    @favorite.mapping.delete
-    def delete_favorite(self, request, pk=None):
+    def _remove_recipe(self, model, error):
         recipe = self.get_object()
-        qs = recipe.favorited_by.filter(user=request.user)
-        if qs.exists():
-            qs.delete()
+        deleted, _ = model.objects.filter(
+            user=self.request.user, recipe=recipe
+        ).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
-            {'errors': 'Рецепт не в избранном!'},
-            status=status.HTTP_400_BAD_REQUEST
+            {'errors': error}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    @action(
-        detail=True,
-        methods=['post'],
-        permission_classes=[IsAuthenticated]
-    )
-    def shopping_cart(self, request, pk=None):
-        recipe = self.get_object()
-        if recipe.in_shopping_carts.filter(user=request.user).exists():
+    def _change_recipes(self, model, error):
+        """
+        POST — добавить рецепты {"recipes": [id, ...]} пачкой,
+        DELETE — убрать их.
+        """
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if self.request.method == 'DELETE':
+            if remove_recipes(model, self.request.user, recipe_ids):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(
+                {'errors': error}, status=status.HTTP_400_BAD_REQUEST
+            )
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        missing = [pk for pk in recipe_ids if pk not in recipes]
+        if missing:
             return Response(
-                {'errors': 'Рецепт уже в корзине!'},
+                {'recipes': [
+                    f'Рецепты не найдены: {", ".join(map(str, missing))}'
+                ]},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        recipe.in_shopping_carts.create(user=request.user)
+        add_recipes(model, self.request.user, recipe_ids)
         data = RecipeSimpleSerializer(
-            recipe, context={'request': request}
+            [recipes[pk] for pk in recipe_ids],
+            many=True,
+            context={'request': self.request}
         ).data
         return Response(data, status=status.HTTP_201_CREATED)
 
+    @action(
+        detail=True,
+        methods=['post'],
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite(self, request, pk=None):
+        return self._add_recipe(Favorite, 'Рецепт уже в избранном!')
+
+    @favorite.mapping.delete
+    def delete_favorite(self, request, pk=None):
+        return self._remove_recipe(Favorite, 'Рецепт не в избранном!')
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite'
+    )
+    def favorite_bulk(self, request):
+        """POST/DELETE /api/recipes/favorite/ {"recipes": [id, ...]}"""
+        return self._change_recipes(Favorite, 'Рецептов нет в избранном!')
+
+    @action(
+        detail=True,
+        methods=['post'],
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart(self, request, pk=None):
+        return self._add_recipe(ShoppingCart, 'Рецепт уже в корзине!')
+
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk=None):
-        recipe = self.get_object()
-        qs = recipe.in_shopping_carts.filter(user=request.user)
-        if qs.exists():
-            qs.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(
-            {'errors': 'Рецепт не в корзине!'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        return self._remove_recipe(ShoppingCart, 'Рецепт не в корзине!')
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart'
+    )
+    def shopping_cart_bulk(self, request):
+        """POST/DELETE /api/recipes/shopping_cart/ {"recipes": [id, ...]}"""
+        return self._change_recipes(ShoppingCart, 'Рецептов нет в корзине!')
 
     @action(
         detail=False,
         methods=['get'],
         permission_classes=[IsAuthenticated],
+        renderer_classes=[JSONRenderer, PlainTextRenderer, PDFRenderer],
         url_path='download_shopping_cart'
     )
     def download_shopping_cart(self, request):
@@ -186,53 +306,46 @@ class RecipeViewSet(ModelViewSet):
         GET /api/recipes/download_shopping_cart/
         Скачивание списка ингредиентов: txt и pdf.
         """
-        qs = RecipeIngredient.objects.filter(
-            recipe__in_shopping_carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        ).order_by('ingredient__name')
-
-        # Текстовый ответ
-        lines = [
-            f"{item['ingredient__name']} "
-            f"({item['ingredient__measurement_unit']}) — "
-            f"{item['total_amount']}"
-            for item in qs
-        ]
-        text_content = "\n".join(lines)
-
-        # PDF ответ
-        buffer = BytesIO()
-        pdf = canvas.Canvas(buffer)
-        y = 800
-        for line in lines:
-            pdf.drawString(50, y, line)
-            y -= 15
-            if y < 50:
-                pdf.showPage()
-                y = 800
-        pdf.save()
-        pdf_content = buffer.getvalue()
-        buffer.close()
-
-        # Выбор формата по параметру?
-        fmt = request.query_params.get('format')
-        if fmt == 'pdf':
-            response = HttpResponse(
-                pdf_content, content_type='application/pdf'
-            )
-            response['Content-Disposition'] = (
-                'attachment; filename="shopping_list.pdf"'
-            )
-        else:
-            response = HttpResponse(
-                text_content, content_type='text/plain'
-            )
-            response['Content-Disposition'] = (
-                'attachment; filename="shopping_list.txt"'
-            )
+        fmt = 'pdf' if request.query_params.get('format') == 'pdf' else 'txt'
+        versions = shopping_list_versions(request.user)
+        cache_key = shopping_list_cache_key(request.user, fmt, versions)
+        etag = shopping_list_etag(cache_key)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            with shopping_list_reads(versions):
+                response = shopping_list_response(
+                    request.user, fmt, cache_key
+                )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_list'
+    )
+    def shopping_list(self, request):
+        """
+        GET /api/recipes/shopping_list/
+        Список покупок в JSON: id, name, measurement_unit, amount.
+        """
+        versions = shopping_list_versions(request.user)
+        etag = shopping_list_etag(
+            shopping_list_cache_key(request.user, 'json', versions)
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            items = ShoppingListItem.objects.filter(
+                user=request.user
+            ).select_related('ingredient')
+            with shopping_list_reads(versions):
+                response = Response(
+                    ShoppingListItemSerializer(items, many=True).data
+                )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
     @action(
@@ -0,0 +1,182 @@
+"""
+Аутентификация по токену без запросов к базе на горячем пути.
+
+Для токена кэшируется только то, что нужно аутентификации и проверке
+прав: id пользователя и флаги is_active, is_staff, is_superuser.
+Пароль, почта и прочие данные в кэш не попадают: пользователь
+собирается из этих полей, остальные загружаются из базы при обращении.
+
+Кэш двухъярусный: LRU в памяти процесса с коротким TTL и общий кэш
+(settings.CACHES). Записи сбрасываются при удалении токена (выход через
+djoser, удаление пользователя) и при сохранении пользователя — смена
+пароля, деактивация (users.signals). Локальный ярус других процессов
+живёт не дольше AUTH_TOKEN_CACHE_LOCAL_TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+SHARED_KEY_PREFIX = 'auth:token:user:'
+# Поля пользователя, которые хранятся в кэше.
+USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+User = get_user_model()
+
+
+class LocalTokenCache:
+    """LRU с TTL: ключ токена -> значения USER_FIELDS."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        if not self.size or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (data, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _dump(token):
+    return tuple(getattr(token.user, field) for field in USER_FIELDS)
+
+
+def _load(key, data):
+    """
+    Токен с пользователем из USER_FIELDS, остальные поля отложены.
+    Каждый раз новые объекты: request.user меняют во вьюхах.
+    """
+    values = dict(zip(USER_FIELDS, data))
+    # from_db ждёт значения в порядке полей модели.
+    names = [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname in values
+    ]
+    user = User.from_db(
+        DEFAULT_DB_ALIAS, names, [values[name] for name in names]
+    )
+    return Token(key=key, user=user)
+
+
+class TokenCache:
+    """Ярусы кэша токенов."""
+
+    def __init__(self):
+        self.local = LocalTokenCache(
+            settings.AUTH_TOKEN_CACHE_SIZE,
+            settings.AUTH_TOKEN_CACHE_LOCAL_TTL
+        )
+
+    @staticmethod
+    def _shared_key(key):
+        # Сами токены в общий кэш не попадают, только их хэши.
+        return SHARED_KEY_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def _shared_enabled():
+        return settings.AUTH_TOKEN_CACHE_TTL > 0
+
+    def get(self, key):
+        data = self.local.get(key)
+        if data is None and self._shared_enabled():
+            data = cache.get(self._shared_key(key))
+            if data is not None:
+                self.local.set(key, data)
+        return None if data is None else _load(key, data)
+
+    async def aget(self, key):
+        data = self.local.get(key)
+        if data is None and self._shared_enabled():
+            data = await cache.aget(self._shared_key(key))
+            if data is not None:
+                self.local.set(key, data)
+        return None if data is None else _load(key, data)
+
+    def set(self, token):
+        """token — с загруженным token.user."""
+        data = _dump(token)
+        self.local.set(token.key, data)
+        if self._shared_enabled():
+            cache.set(
+                self._shared_key(token.key), data,
+                settings.AUTH_TOKEN_CACHE_TTL
+            )
+
+    async def aset(self, token):
+        data = _dump(token)
+        self.local.set(token.key, data)
+        if self._shared_enabled():
+            await cache.aset(
+                self._shared_key(token.key), data,
+                settings.AUTH_TOKEN_CACHE_TTL
+            )
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(key)
+        if keys and self._shared_enabled():
+            cache.delete_many([self._shared_key(key) for key in keys])
+
+
+token_cache = TokenCache()
+
+
+def invalidate_tokens(keys):
+    """
+    Сбросить записи сразу и ещё раз после коммита: запрос, который
+    успел прочитать старые данные до коммита, мог вернуть их в кэш.
+    """
+    keys = list(keys)
+    token_cache.invalidate(keys)
+    transaction.on_commit(lambda: token_cache.invalidate(keys))
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который читает токен из token_cache."""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(token)
+        return token.user, token
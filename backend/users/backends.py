@@ -2,24 +2,50 @@
 
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
 
 class EmailOrUsernameModelBackend(ModelBackend):
     """
-    Authenticate using either username or email.
+    Вход по username или email.
+
+    Логин без @ ищется только по username, с @ — по email и username
+    (в username @ тоже допустим). Обе стороны сравниваются через LOWER(),
+    так что запрос обслуживают индексы из миграции users.0005. Бэкенд
+    единственный в AUTHENTICATION_BACKENDS: одна попытка — один запрос.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None:
             username = kwargs.get('email')
-        try:
-            user = User.objects.get(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            )
-        except User.DoesNotExist:
+        if username is None or password is None:
+            return None
+        user = self.get_user_by_login(username)
+        if user is None:
+            # Как ModelBackend: по времени ответа не видно, есть ли логин.
+            User().set_password(password)
             return None
         if user.check_password(password) and self.user_can_authenticate(user):
             return user
         return None
+
+    @staticmethod
+    def login_queryset(login):
+        value = Lower(Value(login))
+        users = User._default_manager.alias(username_lower=Lower('username'))
+        if '@' not in login:
+            return users.filter(username_lower=value)
+        return users.alias(email_lower=Lower('email')).filter(
+            Q(email_lower=value) | Q(username_lower=value)
+        )
+
+    def get_user_by_login(self, login):
+        users = self.login_queryset(login).order_by('pk')[:2]
+        # Чужой username, совпавший с email, не должен перехватить вход.
+        return min(
+            users,
+            key=lambda user: user.email.lower() != login.lower(),
+            default=None
+        )
@@ -0,0 +1,112 @@
+from time import perf_counter
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from users.backends import EmailOrUsernameModelBackend
+
+User = get_user_model()
+
+# Быстрый хэшер, чтобы замер показывал поиск пользователя, а не PBKDF2.
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер входа по email и username: запросы и время на попытку, '
+        'план запроса поиска пользователя против прежнего '
+        'iexact-варианта. Пользователи создаются во временной транзакции '
+        'и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20000,
+            help='Сколько пользователей создать для замера'
+        )
+        parser.add_argument(
+            '--attempts',
+            type=int,
+            default=500,
+            help='Попыток входа в каждом сценарии'
+        )
+        parser.add_argument(
+            '--real-hasher',
+            action='store_true',
+            help='Проверять пароль хэшером из настроек'
+        )
+
+    def handle(self, *args, **options):
+        hashers = {} if options['real_hasher'] else {
+            'PASSWORD_HASHERS': FAST_HASHERS
+        }
+        with override_settings(**hashers), transaction.atomic():
+            self._populate(options['users'])
+            middle = options['users'] // 2
+            scenarios = (
+                ('email', f'Login{middle}@Example.com', PASSWORD),
+                ('username', f'LOGIN_USER_{middle}', PASSWORD),
+                ('bad password', f'login{middle}@example.com', 'wrong'),
+                ('unknown', 'nobody@example.com', PASSWORD),
+            )
+            self.stdout.write(
+                f'{"scenario":>14} {"queries":>8} {"ms":>8} {"per s":>9}'
+            )
+            for label, login, password in scenarios:
+                queries, elapsed = self._measure(
+                    login, password, options['attempts']
+                )
+                self.stdout.write(
+                    f'{label:>14} {queries:>8} {elapsed * 1000:>8.3f} '
+                    f'{1 / elapsed:>9.0f}'
+                )
+            login = f'login{middle}@example.com'
+            for label, queryset in (
+                ('lower()', EmailOrUsernameModelBackend.login_queryset(
+                    login
+                )),
+                ('iexact', User.objects.filter(
+                    Q(username__iexact=login) | Q(email__iexact=login)
+                )),
+            ):
+                elapsed = self._time_query(queryset, options['attempts'])
+                self.stdout.write(
+                    f'\nПоиск {label}: {elapsed * 1000:.3f} ms\n'
+                    f'{queryset.explain()}'
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, count):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'login_user_{number}',
+                    email=f'login{number}@example.com',
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=1000
+        )
+
+    def _measure(self, login, password, attempts):
+        with CaptureQueriesContext(connection) as ctx:
+            started = perf_counter()
+            for _ in range(attempts):
+                authenticate(username=login, password=password)
+            elapsed = (perf_counter() - started) / attempts
+        return len(ctx.captured_queries) / attempts, elapsed
+
+    def _time_query(self, queryset, attempts):
+        started = perf_counter()
+        for _ in range(attempts):
+            list(queryset.all())
+        return (perf_counter() - started) / attempts
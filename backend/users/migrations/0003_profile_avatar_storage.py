@@ -0,0 +1,22 @@
+import recipes.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=recipes.storage.ContentAddressedStorage(),
+                upload_to='avatars/'
+            ),
+        ),
+    ]
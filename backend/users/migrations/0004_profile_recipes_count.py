@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_count(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('users', 'Profile')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    # Пользователи, созданные до 0002_profile, профиля не имеют.
+    Profile.objects.bulk_create(
+        Profile(user_id=user_id)
+        for user_id in User.objects.filter(
+            profile__isnull=True
+        ).values_list('pk', flat=True).iterator()
+    )
+    Profile.objects.update(recipes_count=Coalesce(Subquery(
+        Recipe.objects.filter(author=OuterRef('user')).order_by().values(
+            'author'
+        ).annotate(total=Count('id')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_profile_avatar_storage'),
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_recipes_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Функциональные индексы LOWER(username) и LOWER(email) для входа
+# (users.backends.EmailOrUsernameModelBackend). Модель пользователя
+# встроенная, поэтому индексы создаются через schema_editor.
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+INDEXES = [
+    models.Index(Lower('username'), name='user_username_lower_idx'),
+    models.Index(Lower('email'), name='user_email_lower_idx'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    for index in INDEXES:
+        schema_editor.add_index(user_model, index)
+
+
+def drop_indexes(apps, schema_editor):
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    for index in INDEXES:
+        schema_editor.remove_index(user_model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0004_profile_recipes_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -3,6 +3,9 @@ from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from recipes.counters import CounterFieldsMixin
+from recipes.storage import media_storage
+
 
 User = settings.AUTH_USER_MODEL
 
@@ -24,7 +27,7 @@ class Subscription(models.Model):
         ordering = ['user', 'author']
 
 
-class Profile(models.Model):
+class Profile(CounterFieldsMixin, models.Model):
     user = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
@@ -32,9 +35,16 @@ class Profile(models.Model):
     )
     avatar = models.ImageField(
         upload_to='avatars/',
+        storage=media_storage,
         null=True,
         blank=True
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('recipes_count',)
 
     class Meta:
         ordering = ['user']
@@ -44,8 +54,13 @@ class Profile(models.Model):
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def create_or_update_profile(sender, instance, created, **kwargs):
+def create_or_update_profile(sender, instance, created, update_fields=None,
+                             **kwargs):
     if created:
         Profile.objects.create(user=instance)
-    else:
-        instance.profile.save()
+    elif update_fields is None or set(update_fields) != {'last_login'}:
+        profile = getattr(instance, 'profile', None)
+        if profile is None:
+            Profile.objects.create(user=instance)
+        else:
+            profile.save()
@@ -1,6 +1,89 @@
+"""
+Пагинация с кэшированным подсчётом.
+
+COUNT(*) с теми же фильтрами, что и у страницы, часто самый дорогой
+запрос ответа. Результат кэшируется ненадолго под ключом из SQL
+подсчёта (это и есть нормализованный набор фильтров) и версий данных
+(recipes.conditional). Для таблиц PostgreSQL без фильтров больше
+APPROXIMATE_COUNT_THRESHOLD строк берётся оценка планировщика из
+pg_class, и в ответе появляется count_approximate = true; оценка
+кэшируется под тем же ключом, что и точное число.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import QuerySet
 from rest_framework.pagination import LimitOffsetPagination
 
+from recipes.conditional import CONTENT_VERSION, viewer_version_name
+from recipes.versions import get_version
+
+COUNT_CACHE_TIMEOUT = 60
+COUNT_CACHE_PREFIX = 'count:'
+APPROXIMATE_COUNT_THRESHOLD = 100_000
+
+
+def estimated_count(queryset):
+    """Оценка планировщика для запроса без фильтров или None."""
+    query = queryset.query
+    connection = connections[queryset.db]
+    if (connection.vendor != 'postgresql' or query.where
+            or query.distinct or query.combinator):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < APPROXIMATE_COUNT_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+def count_cache_key(queryset, user):
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    versions = [get_version(CONTENT_VERSION)]
+    if user.is_authenticated:
+        versions.append(get_version(viewer_version_name(user.pk)))
+    digest = hashlib.md5('\n'.join((
+        queryset.db, sql, repr(params), *versions
+    )).encode()).hexdigest()
+    return COUNT_CACHE_PREFIX + digest
+
+
+def cached_count(queryset, user):
+    """Число строк и признак того, что это оценка."""
+    key = count_cache_key(queryset, user)
+    result = cache.get(key)
+    if result is None:
+        estimate = estimated_count(queryset)
+        if estimate is not None:
+            result = (estimate, True)
+        else:
+            result = (queryset.count(), False)
+        cache.set(key, result, COUNT_CACHE_TIMEOUT)
+    return result
+
+
+class CachedCountMixin:
+    count_approximate = False
+
+    def get_count(self, queryset):
+        if not isinstance(queryset, QuerySet):
+            return super().get_count(queryset)
+        count, self.count_approximate = cached_count(
+            queryset, self.request.user
+        )
+        return count
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_approximate'] = self.count_approximate
+        return response
+
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
+class CustomLimitOffsetPagination(CachedCountMixin, LimitOffsetPagination):
     default_limit = 6
     max_limit = 100
@@ -2,7 +2,10 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
+from foodgram.instrumentation import TimedSerializerMixin
+from recipes.images import variant_url
 from recipes.serializers import RecipeSimpleSerializer
+from recipes.viewer import viewer_context
 
 User = get_user_model()
 
@@ -47,7 +50,7 @@ class CustomUserCreateSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
 
@@ -65,18 +68,13 @@ class CustomUserSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return request.user.subscriptions.filter(author=obj).exists()
+        return obj.pk in viewer_context(
+            self.context.get('request')
+        ).subscriptions
 
     def get_avatar(self, obj):
-        request = self.context.get('request')
         avatar = getattr(getattr(obj, 'profile', None), 'avatar', None)
-        if not avatar or not avatar.name:
-            return None
-        url = avatar.url
-        return request.build_absolute_uri(url) if request else url
+        return variant_url(avatar, 'avatar', self.context.get('request'))
 
 
 class SubscriptionSerializer(CustomUserSerializer):
@@ -89,14 +87,20 @@ class SubscriptionSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, author):
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        qs = author.recipes.all()
-        if limit and limit.isdigit():
-            qs = qs[:int(limit)]
+        if hasattr(author, 'limited_recipes'):
+            qs = author.limited_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.query_params.get('recipes_limit')
+            qs = author.recipes.all()
+            if limit and limit.isdigit():
+                qs = qs[:int(limit)]
         return RecipeSimpleSerializer(
             qs, many=True, context=self.context
         ).data
 
     def get_recipes_count(self, author):
-        return author.recipes.count()
+        profile = getattr(author, 'profile', None)
+        if profile is None:
+            return author.recipes.count()
+        return profile.recipes_count
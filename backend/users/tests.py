@@ -1,3 +1,141 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+from .authentication import TokenCache
+from .models import Profile, Subscription
+from .pagination import cached_count
+
+User = get_user_model()
+
+
+class TokenCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='staff', email='staff@example.com',
+            password='password', is_staff=True
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.token_cache = TokenCache()
+
+    def test_only_auth_fields_cached(self):
+        self.token_cache.set(self.token)
+        self.assertEqual(
+            cache.get(self.token_cache._shared_key(self.token.key)),
+            (self.user.pk, True, True, False)
+        )
+
+    def test_user_rebuilt_from_shared_cache(self):
+        self.token_cache.set(self.token)
+        self.token_cache.local.clear()
+        with self.assertNumQueries(0):
+            user = self.token_cache.get(self.token.key).user
+            self.assertEqual(
+                (user.pk, user.is_active, user.is_staff, user.is_superuser),
+                (self.user.pk, True, True, False)
+            )
+        self.assertIn('password', user.get_deferred_fields())
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'staff@example.com')
+
+
+class CachedCountTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='password'
+        )
+
+    def test_estimate_not_repeated_while_cached(self):
+        with mock.patch(
+            'users.pagination.estimated_count', return_value=None
+        ) as estimated:
+            for _ in range(3):
+                self.assertEqual(
+                    cached_count(User.objects.all(), self.user), (1, False)
+                )
+        self.assertEqual(estimated.call_count, 1)
+        with self.assertNumQueries(0):
+            cached_count(User.objects.all(), self.user)
+
+
+class MissingProfileTest(TestCase):
+    """Авторы без профиля (созданные до появления Profile)."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        Recipe.objects.create(
+            author=self.author, name='Блины', text='Текст', cooking_time=20,
+            image='recipes/images/pancakes.png'
+        )
+        Profile.objects.filter(user=self.author).delete()
+        self.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='password'
+        )
+        Subscription.objects.create(user=self.viewer, author=self.author)
+
+    def test_subscriptions_count_recipes(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        response = client.get('/api/users/subscriptions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['recipes_count'], 1)
+
+    def test_profile_created_with_new_recipe(self):
+        Recipe.objects.create(
+            author=self.author, name='Оладьи', text='Текст', cooking_time=20,
+            image='recipes/images/fritters.png'
+        )
+        self.assertEqual(
+            Profile.objects.get(user=self.author).recipes_count, 2
+        )
+
+
+class SubscriptionsQueriesTest(TestCase):
+    """Страница подписок за постоянное число запросов."""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='password'
+        )
+        for number in range(4):
+            author = User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='password'
+            )
+            Subscription.objects.create(user=self.viewer, author=author)
+            for index in range(3):
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {index}', text='Текст',
+                    cooking_time=20, image=f'recipes/images/{index}.png'
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
 
-# Create your tests here.
+    def test_subscriptions(self):
+        for params, recipes_per_author in (({}, 3), ({'recipes_limit': 2}, 2)):
+            cache.clear()
+            # COUNT, авторы с профилями, рецепты всех авторов одним
+            # запросом, избранное, корзина и подписки зрителя.
+            with self.assertNumQueries(6):
+                response = self.client.get(
+                    '/api/users/subscriptions/', params
+                )
+            results = response.json()['results']
+            self.assertEqual(len(results), 4)
+            for author in results:
+                self.assertEqual(len(author['recipes']), recipes_per_author)
+                self.assertEqual(author['recipes_count'], 3)
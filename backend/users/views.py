@@ -1,10 +1,15 @@
 from django.contrib.auth import get_user_model
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import serializers
+
+from foodgram.replicas import ReplicaReadMixin
 from recipes.fields import Base64ImageField
+from recipes.models import Recipe
 from .models import Subscription, Profile
 from .pagination import CustomLimitOffsetPagination
 from .serializers import (
@@ -25,7 +30,7 @@ class AvatarSerializer(serializers.Serializer):
     avatar = Base64ImageField()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
 
     queryset = User.objects.all()
     pagination_class = CustomLimitOffsetPagination
@@ -40,6 +45,27 @@ class UserViewSet(viewsets.ModelViewSet):
             return CustomUserCreateSerializer
         return CustomUserSerializer
 
+    def _with_subscription_data(self, queryset):
+        """
+        Авторы для SubscriptionSerializer за фиксированное число запросов:
+        первые recipes_limit рецептов всех авторов страницы приходят
+        одним запросом с ROW_NUMBER() по автору, recipes_count — счётчик
+        в профиле.
+        """
+        recipes = Recipe.objects.only(
+            'id', 'author_id', 'name', 'image', 'cooking_time'
+        )
+        limit = self.request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes.annotate(row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=F('id').desc(),
+            )).filter(row_number__lte=int(limit))
+        return queryset.select_related('profile').prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
     @action(
         detail=True,
         methods=['post'],
@@ -67,7 +93,9 @@ class UserViewSet(viewsets.ModelViewSet):
             )
         Subscription.objects.create(user=user, author=author)
         serializer = SubscriptionSerializer(
-            author,
+            self._with_subscription_data(
+                User.objects.filter(pk=author.pk)
+            ).get(),
             context={'request': request}
         )
         return Response(
@@ -82,10 +110,9 @@ class UserViewSet(viewsets.ModelViewSet):
         url_path='subscriptions'
     )
     def subscriptions(self, request):
-        authors_ids = Subscription.objects.filter(
-            user=request.user
-        ).values_list('author', flat=True)
-        qs = User.objects.filter(id__in=authors_ids)
+        qs = self._with_subscription_data(
+            User.objects.filter(subscribers__user=request.user)
+        ).order_by('id')
         page = self.paginate_queryset(qs)
         serializer = SubscriptionSerializer(
             page, many=True, context={'request': request}
@@ -127,8 +154,10 @@ class UserViewSet(viewsets.ModelViewSet):
         url_path='me'
     )
     def me(self, request):
+        # Пользователь из кэша токенов загружен не целиком.
+        user = User.objects.select_related('profile').get(pk=request.user.pk)
         serializer = self.get_serializer(
-            request.user,
+            user,
             context={'request': request}
         )
         return Response(serializer.data)